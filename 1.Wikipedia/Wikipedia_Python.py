@@ -10,18 +10,48 @@
 from pyspark.sql.functions import *
 from pyspark.sql.types import *
 import dlt
+import re
 
 json_path = "/databricks-datasets/wikipedia-datasets/data-001/clickstream/raw-uncompressed-json/2015_2_clickstream.json"
 
+# The clickstream record, declared rather than inferred so the JSON is parsed in a single pass.
+# Every field is read as a string, clickstream_clean casts the ids and counts.
+clickstream_schema = StructType([
+  StructField("prev_id", StringType()),
+  StructField("curr_id", StringType()),
+  StructField("n", StringType()),
+  StructField("prev_title", StringType()),
+  StructField("curr_title", StringType()),
+  StructField("type", StringType())
+])
+
+# Set the pipeline configuration "wikipedia.persist_bronze" to "true" to ingest the JSON into bronze once and keep it across
+# full refreshes, after which clickstream_clean and the gold tables are recomputed from the Delta table alone.
+persist_bronze = spark.conf.get("wikipedia.persist_bronze", "false").lower() == "true"
+
+bronze_properties = {
+  "quality": "bronze",
+  # curr_title has millions of distinct values, far too many to partition on, so the files are Z-ordered on it instead
+  "pipelines.autoOptimize.zOrderCols": "curr_title"
+}
+if persist_bronze:
+  bronze_properties["pipelines.reset.allowed"] = "false"
+
 @dlt.create_table(
   comment="The raw wikipedia click stream dataset, ingested from /databricks-datasets.",
-  table_properties={
-    "quality": "bronze"
-  }
+  table_properties=bronze_properties
 )
-def clickstream_raw():          
+def clickstream_raw():
+  if persist_bronze:
+    # A streaming table only ingests the files it has not seen yet, and is not reset by a full refresh
+    return (
+      spark.readStream
+        .schema(clickstream_schema)
+        .option("pathGlobFilter", json_path.split("/")[-1])
+        .json(json_path.rsplit("/", 1)[0])
+    )
   return (
-    spark.read.option("inferSchema", "true").json(json_path)
+    spark.read.schema(clickstream_schema).json(json_path)
   )
 
 
@@ -45,34 +75,77 @@ def clickstream_clean():
   )
 
 
+def top_k(df, k, column):
+  """
+  Returns the k rows of df with the largest values of column. The limit directly follows the sort, which Spark plans as a
+  bounded top-k selection per partition (TakeOrderedAndProject) instead of a full sort of df.
+  """
+  return df.sort(desc(column)).limit(k)
+
+
 @dlt.create_table(
-  comment="A table of the most common pages that link to the Apache Spark page.",
+  comment="The number of clicks from every referrer to every page, shared by the gold tables.",
   table_properties={
-    "quality": "gold"  
-  }  
+    "quality": "silver",
+    # Lets the top referrer tables, which select a single page, skip the files of every other page
+    "pipelines.autoOptimize.zOrderCols": "current_page_title"
+  }
 )
-def top_spark_referrers():
+def clicks_by_referrer():
   return (
     dlt.read("clickstream_clean")
-      .filter(expr("current_page_title == 'Apache_Spark'"))
-      .withColumnRenamed("previous_page_title", "referrer")
-      .sort(desc("click_count"))
-      .select("referrer", "click_count")
-      .limit(10)
+      .groupBy("current_page_title", "previous_page_title")
+      .agg(sum("click_count").alias("click_count"))
   )
 
 
 @dlt.create_table(
-  comment="A list of the top 50 pages by number of clicks.",
+  comment="The total number of clicks to every page, shared by the gold tables.",
   table_properties={
-    "quality": "gold"  
-  }  
+    "quality": "silver"
+  }
 )
-def top_pages():
+def clicks_by_page():
   return (
-    dlt.read("clickstream_clean")
+    dlt.read("clicks_by_referrer")
       .groupBy("current_page_title")
       .agg(sum("click_count").alias("total_clicks"))
-      .sort(desc("total_clicks"))
-      .limit(50)
   )
+
+
+def create_top_referrers_table(name, page_title, k=10):
+  """
+  Declares the gold table of the k most common pages that link to the specified page, read from clicks_by_referrer.
+  """
+  @dlt.create_table(
+    name=name,
+    comment=f"A table of the most common pages that link to the {page_title.replace('_', ' ')} page.",
+    table_properties={
+      "quality": "gold"
+    }
+  )
+  def top_referrers():
+    referrers = (
+      dlt.read("clicks_by_referrer")
+        .filter(col("current_page_title") == page_title)
+        .select(col("previous_page_title").alias("referrer"), "click_count")
+    )
+    return top_k(referrers, k, "click_count")
+
+
+create_top_referrers_table("top_spark_referrers", "Apache_Spark")
+
+# Set the pipeline configuration "wikipedia.referrer_pages" to a comma separated list of page titles to also declare a
+# top_referrers_<title> table for each of them, e.g. "Python_(programming_language),Scala_(programming_language)"
+for page_title in [title.strip() for title in spark.conf.get("wikipedia.referrer_pages", "").split(",") if title.strip()]:
+  create_top_referrers_table("top_referrers_" + re.sub("[^0-9a-zA-Z]+", "_", page_title).strip("_").lower(), page_title)
+
+
+@dlt.create_table(
+  comment="A list of the top 50 pages by number of clicks.",
+  table_properties={
+    "quality": "gold"  
+  }  
+)
+def top_pages():
+  return top_k(dlt.read("clicks_by_page"), 50, "total_clicks")
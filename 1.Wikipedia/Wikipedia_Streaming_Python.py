@@ -0,0 +1,142 @@
+# Databricks notebook source
+#
+# Wikipedia Clickstream - Streaming
+# A streaming variant of the Wikipedia_Python pipeline, which ingests every monthly clickstream drop as it lands with
+# Auto Loader and updates the silver and gold tables with that month only, so that the pipeline can keep the whole
+# clickstream history without its refreshes taking longer with every month.
+#
+#   Source: the monthly English Wikipedia Clickstream in JSON, one YYYY_M_clickstream.json file per month
+#   More information of the columns can be found at: https://meta.wikimedia.org/wiki/Research:Wikipedia_clickstream
+#
+# Pipeline configuration:
+#   wikipedia.source_path      The directory the monthly drops land in, defaults to the one in /databricks-datasets
+#   wikipedia.month_watermark  How long after a later month landed a month may still receive clicks, see page_clicks_by_month
+#
+
+from pyspark.sql.functions import *
+from pyspark.sql.types import *
+import dlt
+
+source_path = spark.conf.get("wikipedia.source_path", "/databricks-datasets/wikipedia-datasets/data-001/clickstream/raw-uncompressed-json/")
+month_watermark = spark.conf.get("wikipedia.month_watermark", "0 seconds")
+
+# The clickstream record, see Wikipedia_Python
+clickstream_schema = StructType([
+  StructField("prev_id", StringType()),
+  StructField("curr_id", StringType()),
+  StructField("n", StringType()),
+  StructField("prev_title", StringType()),
+  StructField("curr_title", StringType()),
+  StructField("type", StringType())
+])
+
+# The month of a record is the one its file is named after, e.g. 2015_2_clickstream.json
+month_of_file = to_date(concat_ws("-",
+                                  regexp_extract(col("_metadata.file_path"), r"(\d{4})_(\d{1,2})_clickstream", 1),
+                                  lpad(regexp_extract(col("_metadata.file_path"), r"(\d{4})_(\d{1,2})_clickstream", 2), 2, "0"),
+                                  lit("01")))
+
+@dlt.create_table(
+  comment="The raw wikipedia click stream dataset, ingested month by month with Auto Loader.",
+  partition_cols=["month"],
+  table_properties={
+    "quality": "bronze",
+    # The drops are not kept forever at the source, a full refresh must therefore not reset the history
+    "pipelines.reset.allowed": "false",
+    "pipelines.autoOptimize.zOrderCols": "curr_title"
+  }
+)
+@dlt.expect_or_drop("valid_month", "month IS NOT NULL")
+def clickstream_raw():
+  return (
+    spark.readStream.format("cloudFiles")
+      .option("cloudFiles.format", "json")
+      .option("pathGlobFilter", "*_clickstream.json")
+      .schema(clickstream_schema)
+      .load(source_path)
+      .withColumn("month", month_of_file)
+  )
+
+
+# Every month holds a single record per referrer and page, this table is therefore also the clicks per referrer of every month
+@dlt.create_table(
+  comment="Wikipedia clickstream dataset with cleaned-up datatypes / column names and quality expectations, updated with every new month.",
+  partition_cols=["month"],
+  table_properties={
+    "quality": "silver",
+    "pipelines.autoOptimize.zOrderCols": "current_page_title"
+  }
+)
+@dlt.expect("valid_current_page", "current_page_id IS NOT NULL AND current_page_title IS NOT NULL")
+@dlt.expect_or_fail("valid_count", "click_count > 0")
+def clickstream_clean():
+  return (
+    dlt.read_stream("clickstream_raw")
+      .withColumn("current_page_id", expr("CAST(curr_id AS INT)"))
+      .withColumn("click_count", expr("CAST(n AS INT)"))
+      .withColumn("previous_page_id", expr("CAST(prev_id AS INT)"))
+      .withColumnRenamed("curr_title", "current_page_title")
+      .withColumnRenamed("prev_title", "previous_page_title")
+      .select("month", "current_page_id", "current_page_title", "click_count", "previous_page_id", "previous_page_title")
+  )
+
+
+@dlt.create_table(
+  comment="The total number of clicks to every page in every month.",
+  partition_cols=["month"],
+  table_properties={
+    "quality": "silver"
+  }
+)
+def page_clicks_by_month():
+  # The totals of a month are written, once, when the watermark passes it: by default as soon as the update that
+  # ingested the month completes, after which clicks of that month are dropped as late. Set wikipedia.month_watermark
+  # to e.g. "31 days" if the drop of a month can span several updates, which holds every month back until the next lands.
+  return (
+    dlt.read_stream("clickstream_clean")
+      .withColumn("month_start", col("month").cast("timestamp"))
+      .withWatermark("month_start", month_watermark)
+      .groupBy("month_start", "current_page_title")
+      .agg(sum("click_count").alias("total_clicks"))
+      .select(to_date("month_start").alias("month"), "current_page_title", "total_clicks")
+  )
+
+
+def top_k_by_month(df, k, column, label):
+  """
+  Returns, for every month of the streaming df, its k rows with the largest values of column, ranked from 1. A month is
+  ranked once, when the watermark passes it (see page_clicks_by_month), such that every update only ranks the new months.
+  """
+  return (
+    df.withColumn("month_start", col("month").cast("timestamp"))
+      .withWatermark("month_start", month_watermark)
+      .groupBy("month_start")
+      .agg(slice(sort_array(collect_list(struct(column, label)), asc=False), 1, k).alias("top"))
+      .select(to_date("month_start").alias("month"), posexplode("top").alias("position", "row"))
+      .select("month", (col("position") + 1).alias("rank"), col(f"row.{label}").alias(label), col(f"row.{column}").alias(column))
+  )
+
+
+@dlt.create_table(
+  comment="A table of the most common pages that link to the Apache Spark page, in every month.",
+  table_properties={
+    "quality": "gold"
+  }
+)
+def top_spark_referrers_by_month():
+  referrers = (
+    dlt.read_stream("clickstream_clean")
+      .filter(col("current_page_title") == "Apache_Spark")
+      .select("month", col("previous_page_title").alias("referrer"), "click_count")
+  )
+  return top_k_by_month(referrers, 10, "click_count", "referrer")
+
+
+@dlt.create_table(
+  comment="A list of the top 50 pages by number of clicks, in every month.",
+  table_properties={
+    "quality": "gold"
+  }
+)
+def top_pages_by_month():
+  return top_k_by_month(dlt.read_stream("page_clicks_by_month"), 50, "total_clicks", "current_page_title")
@@ -638,13 +638,19 @@ def generate_product_fire(schema, data_type, n):
 
 # COMMAND ----------
 
+import os
 import time
 
 dbutils.fs.mkdirs(f'{output_path}/landing')
+dbutils.fs.mkdirs(f'{output_path}/staging')
 
 for i in range(0, 200):
   time.sleep(int(dbutils.widgets.get('batch_wait')))
-  write_batches_to_file(generate_loans("account", int(dbutils.widgets.get('num_recs'))), f'/dbfs{output_path}/landing/accounts{i}.json')
+  # Each batch is written outside of the landing zone and then renamed into place
+  # so that Auto Loader never picks up a partially written file
+  staging_file = f'/dbfs{output_path}/staging/accounts{i}.json'
+  write_batches_to_file(generate_loans("account", int(dbutils.widgets.get('num_recs'))), staging_file)
+  os.replace(staging_file, f'/dbfs{output_path}/landing/accounts{i}.json')
   print(f'Finished writing batch: {i}')
 
 # COMMAND ----------
@@ -7,6 +7,14 @@
 
 # COMMAND ----------
 
+# MAGIC %run ./_bulk-load-config
+
+# COMMAND ----------
+
+# MAGIC %run ./_customer-spend-config
+
+# COMMAND ----------
+
 DA = DBAcademyHelper(asynchronous=False)      # Create the DA object with the specified lesson
 #DA.cleanup(validate=False)  # Remove the existing database and files
 DA.init(create_db=True)     # True is the default
@@ -0,0 +1,114 @@
+# Databricks notebook source
+# Normally this logic would be in a specific classroom-setup file if used by only one lesson or in _utility-funtions if used by multiple.
+# In this case, it is refactored into a sepearte notebook to make the concepts/patterns easier to understand.
+
+# COMMAND ----------
+
+# The explicit schema of every table loaded by the tasks in bulk, see bulk_load()
+_bulk_load_schemas = {
+    "customers": "id INT, name STRING, city STRING",
+    "products": "id INT, name STRING, category STRING",
+    "orders": "id INT, amount INT, customer_id INT, product_id INT, date DATE",
+}
+
+# COMMAND ----------
+
+def get_load_mode(self):
+    """
+    Returns how the tasks load their data, as specified by the notebook parameter load_mode: "insert" (the default) inserts the sample rows while "bulk" loads the files landed under get_landing_path(), see bulk_load().
+    """
+    return dbutils.widgets.getArgument("load_mode", "insert").lower()
+
+DBAcademyHelper.monkey_patch(get_load_mode)
+
+# COMMAND ----------
+
+def get_landing_path(self, table):
+    """
+    Returns the directory in which the files to be loaded into the specified table land.
+    """
+    return f"{self.paths.working_dir}/landing/{table}"
+
+DBAcademyHelper.monkey_patch(get_landing_path)
+
+# COMMAND ----------
+
+def create_bulk_tables(self):
+    """
+    Creates, unless they already exist, the tables loaded by bulk_load(). They are not replaced because COPY INTO records the files it loaded in the table itself, which is what keeps re-running the job from loading them twice.
+    """
+    for table, schema in _bulk_load_schemas.items():
+        spark.sql(f"CREATE TABLE IF NOT EXISTS {self.db_name}.{table} ({schema})")
+    
+    # The new orders are read from the change data feed, see update_customer_spend()
+    spark.sql(f"ALTER TABLE {self.db_name}.orders SET TBLPROPERTIES (delta.enableChangeDataFeed = true)")
+
+DBAcademyHelper.monkey_patch(create_bulk_tables)
+
+# COMMAND ----------
+
+def bulk_load(self, table):
+    """
+    Loads every JSON file under get_landing_path(table) not already loaded into the table with COPY INTO, such that the load is idempotent. Every value is read as a string and cast to the table's explicit schema, so no pass over the files is spent inferring their types.
+
+    Returns, and prints, the number of rows loaded and the number of bytes written to the table.
+    """
+    import time
+
+    columns = [column.strip().split(" ") for column in _bulk_load_schemas[table].split(",")]
+    select = ", ".join([f"CAST({name} AS {data_type}) AS {name}" for name, data_type in columns])
+    table_name = f"{self.db_name}.{table}"
+
+    start = time.time()
+    version = spark.sql(f"DESCRIBE HISTORY {table_name} LIMIT 1").first()["version"]
+    result = spark.sql(f"""
+        COPY INTO {table_name}
+        FROM (SELECT {select} FROM '{self.get_landing_path(table)}')
+        FILEFORMAT = JSON
+        FORMAT_OPTIONS ('primitivesAsString' = 'true')
+        COPY_OPTIONS ('mergeSchema' = 'false')""").first()
+
+    # A COPY INTO that finds no new files does not commit, in which case nothing was loaded
+    history = spark.sql(f"DESCRIBE HISTORY {table_name} LIMIT 1").first()
+    metrics = history["operationMetrics"] if history["version"] != version else dict()
+
+    summary = {
+        "table": table_name,
+        "rows": int(result.asDict().get("num_inserted_rows", 0)) if result is not None else 0,
+        "bytes": int(metrics.get("numOutputBytes", 0)),
+        "seconds": round(time.time() - start, 1),
+    }
+    print(f"Loaded {summary['rows']:,} rows ({summary['bytes']/1024/1024:,.1f} MB) into {table_name} in {summary['seconds']} seconds")
+    return summary
+
+DBAcademyHelper.monkey_patch(bulk_load)
+
+# COMMAND ----------
+
+def land_bulk_data(self, rows=1000000, files=8):
+    """
+    Lands one more batch of synthetic customers, products and orders, rows of each spread over the specified number of JSON files, under get_landing_path() for the tasks to load in bulk. Ids continue from the previous batches and orders refer to existing customers and products.
+    """
+    from pyspark.sql import functions as F
+
+    # Every batch lands in its own directory, the number of which is the next batch's number
+    orders_path = self.get_landing_path("orders")
+    batch = len(dbutils.fs.ls(orders_path)) if self.paths.exists(orders_path) else 0
+    first_id = batch * rows + 1
+    ids = spark.range(first_id, first_id + rows)
+
+    datasets = {
+        "customers": ids.select("id", F.concat(F.lit("Customer "), "id").alias("name"), F.concat(F.lit("City "), F.col("id") % 500).alias("city")),
+        "products": ids.select("id", F.concat(F.lit("Product "), "id").alias("name"), F.concat(F.lit("Category "), F.col("id") % 20).alias("category")),
+        "orders": ids.select("id",
+                             (F.rand(seed=batch) * 1000).cast("int").alias("amount"),
+                             (F.floor(F.rand(seed=batch+1) * (first_id + rows - 1)) + 1).cast("int").alias("customer_id"),
+                             (F.floor(F.rand(seed=batch+2) * (first_id + rows - 1)) + 1).cast("int").alias("product_id"),
+                             F.date_add(F.lit("2021-01-01"), (F.rand(seed=batch+3) * 730).cast("int")).alias("date")),
+    }
+    for table, df in datasets.items():
+        df.repartition(files).write.json(f"{self.get_landing_path(table)}/batch-{batch:04}")
+
+    print(f"Landed batch #{batch} of {rows:,} customers, products and orders")
+
+DBAcademyHelper.monkey_patch(land_bulk_data)
@@ -0,0 +1,74 @@
+# Databricks notebook source
+# Normally this logic would be in a specific classroom-setup file if used by only one lesson or in _utility-funtions if used by multiple.
+# In this case, it is refactored into a sepearte notebook to make the concepts/patterns easier to understand.
+
+# COMMAND ----------
+
+# Operations on the orders table after which its change data feed holds every new order
+_append_only_operations = ["WRITE", "COPY INTO", "STREAMING UPDATE", "SET TBLPROPERTIES"]
+
+# COMMAND ----------
+
+def _processed_orders_version(table_name):
+    """
+    Returns the version of orders last aggregated into the specified table, as recorded by update_customer_spend(), or None.
+    """
+    metadata = spark.sql(f"DESCRIBE HISTORY {table_name} LIMIT 1").first()["userMetadata"] or ""
+    return int(metadata.split("=")[1]) if metadata.startswith("orders_version=") else None
+
+def update_customer_spend(self):
+    """
+    Brings the customer_spend table, the total amount spent per customer_id and year, up to date with the orders table. Only the orders inserted since the version of orders last aggregated are read, from its change data feed, and merged into the totals, so the cost of an update is proportional to the new orders rather than to all of them. The totals are rebuilt from every order on the first update and whenever orders was replaced, or had rows updated or deleted, since.
+
+    The version of orders aggregated is recorded in the metadata of the very commit updating the totals, such that they can never be updated twice from the same orders.
+    """
+    import time
+
+    start = time.time()
+    orders, spend = f"{self.db_name}.orders", f"{self.db_name}.customer_spend"
+    spark.sql(f"CREATE TABLE IF NOT EXISTS {spend} (customer_id INT, year INT, total_purchase BIGINT)")
+
+    # The change data feed only covers the versions written after it was enabled
+    feed_enabled = spark.sql(f"SHOW TBLPROPERTIES {orders} ('delta.enableChangeDataFeed')").first()["value"] == "true"
+    if not feed_enabled:
+        spark.sql(f"ALTER TABLE {orders} SET TBLPROPERTIES (delta.enableChangeDataFeed = true)")
+
+    processed = _processed_orders_version(spend)
+    history = spark.sql(f"DESCRIBE HISTORY {orders}").select("version", "operation", "operationParameters").collect()
+    current = max([row["version"] for row in history])
+
+    if feed_enabled and processed is not None and processed >= current:
+        print(f"The customer spend is up to date with version {current} of orders")
+        return
+
+    changes = [row for row in history if processed is not None and row["version"] > processed]
+    incremental = feed_enabled and processed is not None and \
+                  min([row["version"] for row in history]) <= processed + 1 and \
+                  all([row["operation"] in _append_only_operations for row in changes]) and \
+                  all([row["operationParameters"].get("mode", "Append") == "Append" for row in changes if row["operation"] == "WRITE"])
+
+    spark.conf.set("spark.databricks.delta.commitInfo.userMetadata", f"orders_version={current}")
+    try:
+        if incremental:
+            spark.sql(f"""
+                MERGE INTO {spend} AS t
+                USING (SELECT customer_id, year(date) AS year, sum(amount) AS total_purchase
+                       FROM table_changes('{orders}', {processed + 1}, {current})
+                       WHERE _change_type = 'insert'
+                       GROUP BY customer_id, year(date)) AS s
+                ON t.customer_id = s.customer_id AND t.year = s.year
+                WHEN MATCHED THEN UPDATE SET t.total_purchase = t.total_purchase + s.total_purchase
+                WHEN NOT MATCHED THEN INSERT *""")
+        else:
+            spark.sql(f"""
+                INSERT OVERWRITE {spend}
+                SELECT customer_id, year(date) AS year, sum(amount) AS total_purchase
+                FROM {orders} VERSION AS OF {current}
+                GROUP BY customer_id, year(date)""")
+    finally:
+        spark.conf.unset("spark.databricks.delta.commitInfo.userMetadata")
+
+    method = f"merged versions {processed + 1} to {current} of orders" if incremental else f"rebuilt from version {current} of orders"
+    print(f"The customer spend was {method} in {time.time() - start:.1f} seconds")
+
+DBAcademyHelper.monkey_patch(update_customer_spend)
@@ -4,10 +4,22 @@
 
 # COMMAND ----------
 
+def land_file(source_file, target_file, staging_dir):
+    """
+    Lands the source file at the target path by first copying it into the staging directory, which must not be under the directory monitored by Auto Loader, and then moving it into place. On storage with atomic renames a stream therefore never observes a partially written file.
+    """
+    import uuid
+    
+    staging_file = f"{staging_dir}/{uuid.uuid4().hex}-{source_file.split('/')[-1]}"
+    dbutils.fs.cp(source_file, staging_file)
+    dbutils.fs.mv(staging_file, target_file)
+
+# COMMAND ----------
+
 # The DataFactory is just a pattern to demonstrate a fake stream is more of a function
 # streaming workloads than it is of a pipeline - this pipeline happens to stream data.
 class DataFactory:
-    def __init__(self):
+    def __init__(self, partition_by_date=False):
         
         # Bind the stream-source to DA because we will use it again later.
         DA.paths.stream_source = f"{DA.paths.working_dir}/stream-source"
@@ -15,16 +27,46 @@ class DataFactory:
         self.source_dir = DA.hidden.datasets
         self.target_dir = DA.paths.stream_source
         
+        # Files are staged next to, not in, the stream-source and then moved into place, see land_file()
+        self.staging_dir = f"{DA.paths.working_dir}/stream-staging"
+        
+        # When true, files land under <dataset>/yyyy/MM/dd/ which keeps each directory small 
+        # and the paths lexically ordered, as expected by Auto Loader's incremental listing
+        self.partition_by_date = partition_by_date
+        
+        # The size of each file, by dataset, as recorded in the manifest cached by 
+        # install_datasets() or, if the manifest is missing, by listing each dataset
+        self.file_sizes = self.read_manifest() or self.list_datasets()
+        
         # All three datasets *should* have the same count, but just in case,
         # We are going to take the smaller count of the three datasets
-        orders_count = len(dbutils.fs.ls(f"{self.source_dir}/orders"))
-        status_count = len(dbutils.fs.ls(f"{self.source_dir}/status"))
-        customer_count = len(dbutils.fs.ls(f"{self.source_dir}/customers"))
-        self.max_batch = min(min(orders_count, status_count), customer_count)
+        self.max_batch = min([len(sizes) for sizes in self.file_sizes.values()])
         
         self.current_batch = 0
         
-    def load(self, continuous=False, delay_seconds=5):
+    def read_manifest(self):
+        import json
+        try: manifest = json.loads(dbutils.fs.head(DA.hidden.manifest, 1024*1024*1024))
+        except Exception: return None # No manifest was cached
+        
+        file_sizes = dict()
+        for dataset_name in ["customers", "orders", "status"]:
+            prefix = f"/{dataset_name}/"
+            files = sorted([path for path in manifest if path.startswith(prefix) and path != prefix])
+            file_sizes[dataset_name] = [manifest[path]["size"] for path in files]
+            if len(files) == 0: return None # The manifest does not cover this dataset, list it instead
+        return file_sizes
+    
+    def list_datasets(self):
+        file_sizes = dict()
+        for dataset_name in ["customers", "orders", "status"]:
+            file_sizes[dataset_name] = [f.size for f in dbutils.fs.ls(f"{self.source_dir}/{dataset_name}")]
+        return file_sizes
+    
+    def batch_size(self, batch):
+        return sum([sizes[batch] or 0 for sizes in self.file_sizes.values()])
+        
+    def load(self, continuous=False, delay_seconds=5, *, batches=1):
         import time
         self.start = int(time.time())
         
@@ -32,23 +74,109 @@ class DataFactory:
             print("Data source exhausted\n")
             return False
         elif continuous:
-            while self.load():
+            while self.load(batches=batches):
                 time.sleep(delay_seconds)
             return False
         else:
-            print(f"Loading batch {self.current_batch+1} of {self.max_batch}", end="...")
-            self.copy_file("customers")
-            self.copy_file("orders")
-            self.copy_file("status")
-            self.current_batch += 1
-            print(f"{int(time.time())-self.start} seconds")
+            last_batch = min(self.current_batch + batches, self.max_batch)
+            if last_batch - self.current_batch == 1: print(f"Loading batch {self.current_batch+1} of {self.max_batch}", end="...")
+            else: print(f"Loading batches {self.current_batch+1}-{last_batch} of {self.max_batch}", end="...")
+            
+            self.copy_files(range(self.current_batch, last_batch))
+            total_bytes = sum([self.batch_size(batch) for batch in range(self.current_batch, last_batch)])
+            self.current_batch = last_batch
+            print(f"{total_bytes/1024/1024:.1f} MB in {int(time.time())-self.start} seconds")
             return True
+        
+    def load_all(self):
+        return self.load(batches=self.max_batch-self.current_batch)
+
+    def read_event_times(self):
+        # The earliest order_timestamp/status_timestamp of each batch in epoch seconds. Both
+        # columns are read as strings to avoid schema inference and may be epoch seconds or dates.
+        from pyspark.sql import functions as F
+
+        event_times = dict()
+        for dataset_name, column in [("orders", "order_timestamp"), ("status", "status_timestamp")]:
+            event_time = F.coalesce(F.col(column).cast("double"), F.col(column).cast("timestamp").cast("double"))
+            rows = (spark.read.schema(f"{column} STRING").json(f"{self.source_dir}/{dataset_name}")
+                         .groupBy(F.input_file_name().alias("file"))
+                         .agg(F.min(event_time).alias("event_time"))
+                         .collect())
+            for row in rows:
+                if row["event_time"] is None: continue
+                batch = int(row["file"].split("/")[-1].split(".")[0])
+                event_times[batch] = min(event_times.get(batch, row["event_time"]), row["event_time"])
+
+        # Batches land in order, as such event times are carried forward to be non-decreasing
+        results = list()
+        for batch in range(self.max_batch):
+            previous = results[-1] if len(results) > 0 else None
+            current = event_times.get(batch, previous)
+            results.append(current if previous is None or current is None else max(previous, current))
+        return results
+
+    def replay(self, compression=3600, max_batches=None):
+        """
+        Lands the remaining batches at the rate at which their events occurred: each batch is landed
+        (event time - event time of the first batch) / compression seconds after the replay starts,
+        compression=3600 replaying one hour of events per second. Reports the intended and actual arrival rates.
+        """
+        import time
+
+        event_times = self.read_event_times()
+        first_batch = self.current_batch
+        last_batch = self.max_batch if max_batches is None else min(self.max_batch, first_batch + max_batches)
+        if first_batch >= last_batch:
+            self.load() # Reports that the data source is exhausted
+            return {"intended_offsets": [], "actual_offsets": [], "intended_rate": 0.0, "actual_rate": 0.0, "max_lag": 0.0}
+
+        # Batches without an event time land with the first batch that has one or, if none has, all at once
+        origin = next((event_times[batch] for batch in range(first_batch, last_batch) if event_times[batch] is not None), None)
+        if origin is None: print("No event times were found, landing the batches without delay")
+        start = time.time()
+        intended, actual = list(), list()
+
+        for batch in range(first_batch, last_batch):
+            event_time = event_times[batch]
+            offset = 0.0 if origin is None or event_time is None else (event_time - origin) / compression
+            delay = start + offset - time.time()
+            if delay > 0: time.sleep(delay)
+
+            intended.append(offset)
+            actual.append(time.time() - start)
+            self.load()
+
+        count = last_batch - first_batch
+        intended_rate = count / intended[-1] if intended[-1] > 0 else float("inf")
+        actual_rate = count / actual[-1] if actual[-1] > 0 else float("inf")
+        max_lag = max([a - i for a, i in zip(actual, intended)])
+
+        print(f"Replayed {count} batches in {actual[-1]:.1f} seconds, intended {intended[-1]:.1f} seconds")
+        print(f"Arrival rate: {actual_rate:.3f} batches/second actual, {intended_rate:.3f} batches/second intended, max lag {max_lag:.1f} seconds")
+
+        return {"intended_offsets": intended, "actual_offsets": actual,
+                "intended_rate": intended_rate, "actual_rate": actual_rate, "max_lag": max_lag}
+
+    def copy_files(self, batches, max_workers=8):
+        # The customers, orders and status files of every batch are copied concurrently
+        from concurrent.futures import ThreadPoolExecutor
+        
+        jobs = [(dataset_name, batch) for batch in batches for dataset_name in ["customers", "orders", "status"]]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(lambda job: self.copy_file(*job), jobs))
             
-    def copy_file(self, dataset_name):
-        file = f"{dataset_name}/{self.current_batch:02}.json"
+    def copy_file(self, dataset_name, batch=None):
+        import datetime
+        
+        if batch is None: batch = self.current_batch
+        file = f"{dataset_name}/{batch:02}.json"
         source_file = f"{self.source_dir}/{file}"
-        target_file = f"{self.target_dir}/{file}"
-        dbutils.fs.cp(source_file, target_file)
+        
+        if self.partition_by_date: target_file = f"{self.target_dir}/{dataset_name}/{datetime.date.today():%Y/%m/%d}/{batch:02}.json"
+        else: target_file = f"{self.target_dir}/{file}"
+        
+        land_file(source_file, target_file, self.staging_dir)
 
 # COMMAND ----------
 
@@ -119,59 +247,167 @@ DBAcademyHelper.monkey_patch(print_pipeline_config)
 
 # COMMAND ----------
 
+def _normalize_configuration(configuration):
+    """
+    Returns the configuration with every value rendered as the string returned by the REST API.
+    """
+    return {key: str(value).lower() if isinstance(value, bool) else str(value) for key, value in (configuration or {}).items()}
+
+def _diff_pipeline_settings(spec, storage, target, notebooks, configuration):
+    """
+    Compares the spec of an existing pipeline to the prescribed settings, returning the names of the settings that differ. Configuration keys that are not prescribed are ignored.
+    """
+    configuration = _normalize_configuration(configuration)
+    current_configuration = _normalize_configuration(spec.get("configuration"))
+    
+    current = {
+        "storage": spec.get("storage"),
+        "target": spec.get("target"),
+        "notebooks": [library.get("notebook", {}).get("path") for library in spec.get("libraries", [])],
+        "configuration": {key: current_configuration.get(key) for key in configuration},
+    }
+    prescribed = {
+        "storage": storage,
+        "target": target,
+        "notebooks": notebooks,
+        "configuration": configuration,
+    }
+    return [key for key in prescribed if current[key] != prescribed[key]]
+
+# COMMAND ----------
+
 def create_pipeline(self):
     """
-    Creates the prescribed pipline.
+    Creates the prescribed pipline or, if it already exists, reuses it - editing its settings in place when they differ from the prescribed ones.
     """
     
-    from dbacademy.dbrest import DBAcademyRestClient
-    client = DBAcademyRestClient()
+    client = self.get_rest_client()
 
     config = self.get_pipeline_config()
-    print(f"Creating the pipeline \"{config.name}\"")
-
-    # Delete the existing pipeline if it exists
-    client.pipelines().delete_by_name(config.name)
+    print(f"Creating or updating the pipeline \"{config.name}\"")
 
-    # Create the new pipeline
-    pipeline = client.pipelines().create(
-        name = config.name, 
-        storage = self.paths.storage_location, 
-        target = self.db_name, 
-        notebooks = config.notebooks,
+    with self.profile("create_pipeline", emit=True):
         configuration = {
             "source": config.source,
             "pipelines.applyChangesPreviewEnabled": True
-        })
+        }
+        
+        # Reuse the existing pipeline, and with it its state and checkpoints, editing it only if its settings differ
+        existing = client.pipelines().get_by_name(config.name)
+        if existing is not None:
+            pipeline_id = existing.get("pipeline_id")
+            spec = client.pipelines().get_by_id(pipeline_id).get("spec")
+            changes = _diff_pipeline_settings(spec, self.paths.storage_location, self.db_name, config.notebooks, configuration)
+            
+            if len(changes) == 0:
+                print(f"Reusing the unchanged pipeline {pipeline_id}")
+                self.pipeline_id = pipeline_id
+                return
+            
+            elif "storage" not in changes: # The storage location cannot be edited
+                print(f"Updating the {', '.join(changes)} of the pipeline {pipeline_id}")
+                spec["storage"] = self.paths.storage_location
+                spec["target"] = self.db_name
+                spec["libraries"] = [{"notebook": {"path": path}} for path in config.notebooks]
+                spec["configuration"] = {**spec.get("configuration", {}), **_normalize_configuration(configuration)}
+                client.execute_put_json(f"{client.endpoint}/api/2.0/pipelines/{pipeline_id}", spec)
+                self.pipeline_id = pipeline_id
+                return
+            
+            # Delete the existing pipeline as it cannot be updated in place
+            client.pipelines().delete_by_name(config.name)
+
+        # Create the new pipeline
+        pipeline = client.pipelines().create(
+            name = config.name, 
+            storage = self.paths.storage_location, 
+            target = self.db_name, 
+            notebooks = config.notebooks,
+            configuration = configuration)
     
-    self.pipeline_id = pipeline.get("pipeline_id")
-       
+        self.pipeline_id = pipeline.get("pipeline_id")
+
 DBAcademyHelper.monkey_patch(create_pipeline)
 
 # COMMAND ----------
 
-def start_pipeline(self):
-    "Starts the pipline and then blocks until it has completed, failed or was canceled"
+def _run_async(coroutine):
+    """
+    Returns the result of the coroutine, run in a separate thread if this thread already runs an event loop (e.g. under IPython).
+    """
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    
+    try: asyncio.get_running_loop()
+    except RuntimeError: return asyncio.run(coroutine)
+    
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
 
-    import time
-    from dbacademy.dbrest import DBAcademyRestClient
-    client = DBAcademyRestClient()
+async def _run_pipeline_update(client, pipeline_id, min_interval, max_interval, backoff=1.5):
+    """
+    Starts an update of the specified pipeline and polls it until it has completed, failed or was canceled. The polling interval starts at min_interval seconds and grows by the backoff factor up to max_interval seconds. Returns the final state, the wall-clock duration and the time at which each state was first observed.
+    """
+    import asyncio, time
+    
+    loop = asyncio.get_running_loop()
+    start = time.time()
+    
+    response = await loop.run_in_executor(None, client.pipelines().start_by_id, pipeline_id)
+    update_id = response.get("update_id")
+    
+    transitions = list() # (state, seconds since start)
+    interval = min_interval
+    
+    while True:
+        update = await loop.run_in_executor(None, client.pipelines().get_update_by_id, pipeline_id, update_id)
+        state = update.get("update").get("state")
+        if len(transitions) == 0 or transitions[-1][0] != state:
+            transitions.append((state, round(time.time() - start, 1)))
+            print(f"Pipeline {pipeline_id}: {state} after {transitions[-1][1]} seconds")
+        
+        if state in ["COMPLETED", "FAILED", "CANCELED"]: break
+        
+        await asyncio.sleep(interval)
+        interval = min(interval * backoff, max_interval)
+    
+    return {
+        "pipeline_id": pipeline_id,
+        "update_id": update_id,
+        "state": state,
+        "duration": round(time.time() - start, 1),
+        "transitions": transitions,
+    }
 
-    # Start the pipeline
-    start = client.pipelines().start_by_id(self.pipeline_id)
-    update_id = start.get("update_id")
+# COMMAND ----------
 
-    # Get the status and block until it is done
-    update = client.pipelines().get_update_by_id(self.pipeline_id, update_id)
-    state = update.get("update").get("state")
+def start_pipelines(self, pipeline_ids, min_interval=1, max_interval=15):
+    """
+    Concurrently starts one update of each of the specified pipelines and then blocks until all of them have completed, failed or were canceled, returning the per-update results of _run_pipeline_update().
+    """
+    import asyncio
+    client = self.get_rest_client()
+    
+    async def run_all():
+        return await asyncio.gather(*[_run_pipeline_update(client, pipeline_id, min_interval, max_interval) for pipeline_id in pipeline_ids])
+    
+    results = _run_async(run_all())
+    
+    for result in results:
+        transitions = ", ".join([f"{state} @ {seconds}s" for state, seconds in result["transitions"]])
+        print(f"Pipeline {result['pipeline_id']}: {result['state']} in {result['duration']} seconds ({transitions})")
+    
+    return results
 
-    done = ["COMPLETED", "FAILED", "CANCELED"]
-    while state not in done:
-        duration = 15
-        time.sleep(duration)
-        print(f"Current state is {state}, sleeping {duration} seconds.")    
-        update = client.pipelines().get_update_by_id(self.pipeline_id, update_id)
-        state = update.get("update").get("state")
+DBAcademyHelper.monkey_patch(start_pipelines)
+
+# COMMAND ----------
+
+def start_pipeline(self):
+    "Starts the pipline and then blocks until it has completed, failed or was canceled"
+
+    result = self.start_pipelines([self.pipeline_id])[0]
+    state = result.get("state")
     
     print(f"The final state is {state}.")    
     assert state == "COMPLETED", f"Expected the state to be COMPLETED, found {state}"
@@ -39,6 +39,21 @@
 
 # COMMAND ----------
 
+# MAGIC %md
+# MAGIC ## Bulk Load Mode
+# MAGIC 
+# MAGIC When the job is run with the task parameter `load_mode` set to `bulk`, **Task-2**, **Task-3** and **Task-4** load the files landed under `DA.get_landing_path()` with `COPY INTO` instead of inserting their sample rows. More data can be landed at any time with `DA.land_bulk_data()`.
+# MAGIC 
+# MAGIC `COPY INTO` records in each table which files it already loaded. In bulk mode the tables are therefore only created if they do not exist yet, instead of being replaced, so that re-running the job never loads the same file twice.
+
+# COMMAND ----------
+
+if DA.get_load_mode() == "bulk":
+    DA.create_bulk_tables()
+    dbutils.notebook.exit("Created the tables for bulk loading")
+
+# COMMAND ----------
+
 # MAGIC %md
 # MAGIC ## Create Customers Table 
 
@@ -65,7 +80,8 @@
 # COMMAND ----------
 
 # MAGIC %sql
-# MAGIC CREATE OR REPLACE TABLE orders (id INT, amount INT, customer_id INT, product_id INT, date DATE);
+# MAGIC CREATE OR REPLACE TABLE orders (id INT, amount INT, customer_id INT, product_id INT, date DATE)
+# MAGIC TBLPROPERTIES (delta.enableChangeDataFeed = true);
 
 # COMMAND ----------
 
@@ -30,6 +30,19 @@
 
 # COMMAND ----------
 
+# MAGIC %md
+# MAGIC ## Bulk Load Order Data
+# MAGIC 
+# MAGIC In bulk load mode, see **Task-1**, the files landed under `DA.get_landing_path("orders")` are loaded with `COPY INTO` instead of inserting the sample rows below. As files already loaded are skipped, re-running this task does not duplicate any rows.
+
+# COMMAND ----------
+
+if DA.get_load_mode() == "bulk":
+    import json
+    dbutils.notebook.exit(json.dumps(DA.bulk_load("orders")))
+
+# COMMAND ----------
+
 # MAGIC %md
 # MAGIC ## Insert Order Data 
 
@@ -33,21 +33,32 @@
 # MAGIC %md
 # MAGIC ## Customer with Highest Amount of Purchase 
 # MAGIC 
+# MAGIC ### Update the Spend per Customer and Year
+# MAGIC 
+# MAGIC Rather than summing every order on every run, the total spend per customer and year is maintained in the `customer_spend` table. Each run only merges the orders inserted since the previous run, read from the change data feed of `orders`, so its cost grows with the new orders instead of with the whole history.
+
+# COMMAND ----------
+
+DA.update_customer_spend()
+
+# COMMAND ----------
+
+# MAGIC %md
 # MAGIC ### Create Year Parameter
 # MAGIC 
-# MAGIC To demonstrate Workflow's parameter capability we are going to create a parameter for this notebook and pass the parameter value in the task definition. Let's create a `year` parameter and filter the `orders` based on this parameter. 
+# MAGIC To demonstrate Workflow's parameter capability we are going to create a parameter for this notebook and pass the parameter value in the task definition. Let's create a `year` parameter and filter the `customer_spend` based on this parameter. 
 
 # COMMAND ----------
 
 # MAGIC %sql
-# MAGIC CREATE WIDGET DROPDOWN year DEFAULT "2021" CHOICES SELECT DISTINCT date_format(date, 'y') FROM orders
+# MAGIC CREATE WIDGET DROPDOWN year DEFAULT "2021" CHOICES SELECT DISTINCT CAST(year AS STRING) FROM customer_spend
 
 # COMMAND ----------
 
 # MAGIC %md 
 # MAGIC ### Aggregate Data
 # MAGIC 
-# MAGIC In order to find the customer who had highest total purchase, we need to join customer data and orders data. After joining both tables, the customer name, city and total purchase amount of the customer with highest total purchase is returned.
+# MAGIC In order to find the customer who had highest total purchase in the selected year, we pick the top customer of that year from `customer_spend` and join it with the customer data. The customer name, city and total purchase amount of the customer with highest total purchase is returned. The year parameter is cast to an integer so that it is compared with the `year` column as a number rather than as a string.
 # MAGIC 
 # MAGIC **Note:** The table in `line 5` is misspelled intentionally. Obviously, this is going to cause the task failure while executing the workflow. We are going to demonstrate how to use **Repair** job feature of Workflows after the run fails.   
 
@@ -61,12 +72,14 @@
 # MAGIC   JOIN (
 # MAGIC     SELECT
 # MAGIC       customer_id,
-# MAGIC       sum(amount) AS total_purchase
+# MAGIC       total_purchase
 # MAGIC     FROM
-# MAGIC       orders
-# MAGIC     WHERE date > getArgument('year')
-# MAGIC     GROUP BY
-# MAGIC       customer_id
+# MAGIC       customer_spend
+# MAGIC     WHERE year = CAST(getArgument('year') AS INT)
+# MAGIC     ORDER BY
+# MAGIC       total_purchase DESC
+# MAGIC     LIMIT
+# MAGIC       1
 # MAGIC   ) AS p ON c.id = p.customer_id
 # MAGIC ORDER BY
 # MAGIC   total_purchase DESC
@@ -0,0 +1,102 @@
+"""
+Offline benchmark of the job DAG declared by get_job_config(), executed by
+run_job_locally() at several levels of concurrency, to measure how much of the
+total task time the DAG lets run in parallel and how far the wall-clock time is
+from the critical path.
+
+Tasks either sleep for a synthetic duration (the default, to iterate on task
+ordering) or execute the %sql and Python cells of their notebooks against local
+Spark, with Delta when delta-spark is installed.
+
+Usage:
+    python bench_dag.py --workers 1,2,4 --task-seconds 1 --duration Task-5-Highest-Paid-Customer=3
+    python bench_dag.py --mode notebooks --year 2021
+"""
+import io
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+
+import local_databricks
+
+WORKFLOW = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def load_helpers(args, fs, spark):
+    """Executes the Includes notebooks against the stand-ins and returns their namespace."""
+    local_databricks.install_dbacademy_stubs("/Repos/bench/4.workflow/Task-1-Create-Tables")
+    namespace = local_databricks.create_namespace(fs, spark, notebook_path="/Repos/bench/4.workflow/ITW 01 - Introduction to Workflows")
+    for notebook in ["_utility-functions.py", "_multi-task-jobs-config.py", "_bulk-load-config.py"]:
+        local_databricks.run_notebook(os.path.join(args.includes, notebook), namespace)
+    return namespace
+
+
+def synthetic_runner(args):
+    """Returns a run_task() sleeping for each task's duration and failing the tasks listed with --fail."""
+    durations = dict(item.split("=", 1) for item in args.duration)
+
+    def run_task(task):
+        time.sleep(float(durations.get(task.name, args.task_seconds)))
+        if task.name in args.fail:
+            raise Exception(f"{task.name} failed as requested")
+    return run_task
+
+
+def notebook_runner(args, spark, DA, namespace):
+    """Returns a run_task() executing the %sql and Python cells of the task's notebook, found next to the Includes."""
+    # The SQL stand-in only records statements, which the Python cells cannot work with
+    if isinstance(spark, local_databricks.StubSpark):
+        namespace = None
+
+    def run_task(task):
+        path = os.path.join(WORKFLOW, f"{task.resource.split('/')[-1]}.py")
+        local_databricks.run_sql_notebook(path, spark, {"DA.db_name": DA.db_name}, {"year": args.year}, namespace)
+    return run_task
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parallelism of the job's task DAG")
+    parser.add_argument("--includes", type=str, default=os.path.join(WORKFLOW, "Includes"))
+    parser.add_argument("--mode", choices=["synthetic", "notebooks"], default="synthetic")
+    parser.add_argument("--workers", type=str, default="1,2,4", help="comma separated levels of concurrency")
+    parser.add_argument("--task-seconds", type=float, default=1.0, help="synthetic duration of every task")
+    parser.add_argument("--duration", type=str, action="append", default=[], help="TASK=SECONDS, may be repeated")
+    parser.add_argument("--fail", type=str, action="append", default=[], help="synthetic task to fail, may be repeated")
+    parser.add_argument("--year", type=str, default="2021", help="the year argument of the notebooks")
+    parser.add_argument("--no-pyspark", action="store_true", help="use the SQL stand-in even if PySpark is installed")
+    parser.add_argument("--verbose", action="store_true", help="show the per-task report of every run")
+    args = parser.parse_args()
+
+    fs = local_databricks.LocalFileSystem(tempfile.mkdtemp(prefix="dbacademy-bench-"))
+    spark = local_databricks.create_spark(fs, "bench@example.com", use_pyspark=args.mode == "notebooks" and not args.no_pyspark)
+    if args.mode == "notebooks" and isinstance(spark, local_databricks.StubSpark):
+        print("Without PySpark the notebooks' statements are only recorded, not executed", file=sys.stderr)
+
+    namespace = load_helpers(args, fs, spark)
+    DA = namespace["DBAcademyHelper"](lesson="dag", asynchronous=False)
+    namespace["DA"] = DA
+    with contextlib.redirect_stdout(io.StringIO()):
+        DA.init(create_db=args.mode == "notebooks")
+
+    run_task = synthetic_runner(args) if args.mode == "synthetic" else notebook_runner(args, spark, DA, namespace)
+
+    results = []
+    for workers in [int(value) for value in args.workers.split(",")]:
+        output = None if args.verbose else io.StringIO()
+        with contextlib.redirect_stdout(output) if output else contextlib.nullcontext():
+            results.append((workers, DA.run_job_locally(run_task=run_task, max_workers=workers)))
+
+    print(f"\n{'workers':>8}{'wall (s)':>10}{'task time (s)':>15}{'critical path (s)':>19}{'parallelism':>13}{'failed':>8}")
+    print("-" * 73)
+    for workers, result in results:
+        failed = sum(1 for task in result["tasks"].values() if task["state"] != "SUCCESS")
+        print(f"{workers:>8}{result['wall']:>10.2f}{result['total']:>15.2f}{result['critical_path_seconds']:>19.2f}"
+              f"{result['total'] / max(result['wall'], 0.001):>13.2f}{failed:>8}")
+    print(f"\ncritical path: {' > '.join(results[-1][1]['critical_path'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Offline benchmark of the pipeline and job helpers (create_pipeline, start_pipeline,
+start_pipelines, create_job and start_job) and of dlt_monitor, run against the
+scripted workspace of mock_rest_server.
+
+For every operation it reports the wall-clock time next to the time the workspace
+was scripted to take, the difference being the helper's overhead (mostly the time
+between a state change and the poll that observes it), as well as how many polls
+were made, how many of them observed nothing new and the largest detection lag.
+
+Usage:
+    python bench_orchestration.py --running-seconds 3 --pipelines 4
+    python bench_orchestration.py --error-rate 0.2 --failure-rate 0.1 --seed 7
+"""
+import io
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+
+import local_databricks
+from mock_rest_server import MockRestServer, Scenario
+
+DLT_UTILS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "5.to go", "dms-dlt-cdc-demo", "resources", "utils")
+
+
+def load_helpers(args, fs, spark, endpoint):
+    """Executes the Includes notebooks with dbacademy.dbrest bound to the mock server and returns their namespace."""
+    local_databricks.install_dbacademy_stubs(
+        "/Repos/bench/4.workflow/Task-1-Create-Tables",
+        rest_client_factory=lambda: local_databricks.LocalRestClient(endpoint, poll_seconds=args.poll_seconds))
+    namespace = local_databricks.create_namespace(fs, spark, notebook_path="/Repos/bench/4.workflow/EC 03 - Build Directives")
+    for notebook in ["_utility-functions.py", "_pipeline_config.py", "_multi-task-jobs-with-piplines-config.py"]:
+        local_databricks.run_notebook(os.path.join(args.includes, notebook), namespace)
+    return namespace
+
+
+def measure(label, function, stats, scripted, results, quiet=True):
+    """
+    Times the function and summarizes the poll statistics of the updates or runs it
+    created, i.e. the entries of stats() that did not exist before it was called.
+    """
+    before = {entry["id"] for entry in stats()}
+    output = io.StringIO() if quiet else None
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+        value = function()
+    wall = time.perf_counter() - start
+
+    new = [entry for entry in stats() if entry["id"] not in before]
+    lags = [entry["lag"] for entry in new if entry["lag"] is not None]
+    results.append({
+        "label": label,
+        "wall": wall,
+        "scripted": scripted(new) if new else 0.0,
+        "polls": sum(entry["polls"] for entry in new),
+        "wasted": sum(entry["wasted_polls"] for entry in new),
+        "lag": max(lags) if lags else 0.0,
+    })
+    return value
+
+
+def monitor_with_dlt_monitor(endpoint, pipeline_ids, args):
+    """Runs dlt_monitor.monitor_all() against the mock server, None if databricks_cli is not installed."""
+    sys.path.insert(0, DLT_UTILS)
+    try:
+        import dlt_monitor
+    except ImportError as e:
+        print(f"Skipping dlt_monitor: {e}", file=sys.stderr)
+        return None
+    finally:
+        sys.path.remove(DLT_UTILS)
+
+    import asyncio
+    client = local_databricks.LocalRestClient(endpoint)
+    return lambda: asyncio.run(dlt_monitor.monitor_all(client, {pipeline_id: {} for pipeline_id in pipeline_ids},
+                                                      args.min_interval, args.max_interval))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline and job helpers against a mock workspace")
+    parser.add_argument("--includes", type=str, default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Includes"))
+    parser.add_argument("--pipelines", type=int, default=4, help="pipelines updated concurrently by start_pipelines")
+    parser.add_argument("--queued-seconds", type=float, default=0.5)
+    parser.add_argument("--initializing-seconds", type=float, default=0.5)
+    parser.add_argument("--running-seconds", type=float, default=2.0)
+    parser.add_argument("--setup-seconds", type=float, default=0.5, help="per job task, to acquire its cluster")
+    parser.add_argument("--task-seconds", type=float, default=1.0, help="per job task, once set up")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="probability an update or task fails")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability a GET is answered with 429/503")
+    parser.add_argument("--latency-ms", type=float, default=5, help="added to every request")
+    parser.add_argument("--min-interval", type=float, default=1, help="first pipeline polling interval")
+    parser.add_argument("--max-interval", type=float, default=15, help="largest pipeline polling interval")
+    parser.add_argument("--poll-seconds", type=float, default=5, help="job run polling interval of runs().wait_for()")
+    parser.add_argument("--runs", type=int, default=4, help="job runs triggered by start_job_runs")
+    parser.add_argument("--max-concurrent-runs", type=int, default=2, help="of the job created by create_job")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true", help="show the output of the helpers")
+    args = parser.parse_args()
+
+    scenario = Scenario(queued_seconds=args.queued_seconds, initializing_seconds=args.initializing_seconds,
+                        running_seconds=args.running_seconds, setup_seconds=args.setup_seconds,
+                        task_seconds=args.task_seconds, failure_rate=args.failure_rate,
+                        error_rate=args.error_rate, latency_ms=args.latency_ms)
+
+    fs = local_databricks.LocalFileSystem(tempfile.mkdtemp(prefix="dbacademy-bench-"))
+    spark = local_databricks.create_spark(fs, "bench@example.com", use_pyspark=False)
+
+    with MockRestServer(scenario, seed=args.seed) as server:
+        workspace = server.workspace
+        namespace = load_helpers(args, fs, spark, server.endpoint)
+        DA = namespace["DBAcademyHelper"](lesson="orchestration", asynchronous=False)
+        namespace["DA"] = DA
+        DA.paths.storage_location = f"{DA.paths.working_dir}/storage"
+        DA.paths.stream_source = f"{DA.paths.working_dir}/stream-source"
+
+        quiet = not args.verbose
+        results = []
+        no_updates = lambda new: 0.0
+        longest = lambda new: max(entry["duration"] for entry in new)
+
+        measure("create_pipeline() - create", DA.create_pipeline, workspace.update_stats, no_updates, results, quiet)
+        measure("create_pipeline() - reuse", DA.create_pipeline, workspace.update_stats, no_updates, results, quiet)
+
+        def start_pipeline():
+            try: DA.start_pipeline()
+            except AssertionError as e: print(e)  # A scripted failure, still measured
+        measure("start_pipeline()", start_pipeline, workspace.update_stats, longest, results, quiet)
+
+        client = DA.get_rest_client()
+        pipeline_ids = [client.pipelines().create(name=f"bench-pipeline-{i}", storage=f"dbfs:/bench/{i}", target="bench",
+                                                  notebooks=[]).get("pipeline_id") for i in range(args.pipelines)]
+        measure(f"start_pipelines({args.pipelines})", lambda: DA.start_pipelines(pipeline_ids, args.min_interval, args.max_interval),
+                workspace.update_stats, longest, results, quiet)
+
+        monitor = monitor_with_dlt_monitor(server.endpoint, pipeline_ids, args)
+        if monitor is not None:
+            measure(f"dlt_monitor.monitor_all({args.pipelines})", monitor, workspace.update_stats, longest, results, quiet)
+
+        get_job_config = DA.get_job_config
+        def get_bench_job_config():
+            config = get_job_config()
+            config.max_concurrent_runs = args.max_concurrent_runs
+            return config
+        DA.get_job_config = get_bench_job_config
+
+        measure("create_job()", DA.create_job, workspace.run_stats, no_updates, results, quiet)
+
+        def start_job():
+            try: DA.start_job()
+            except AssertionError as e: print(e)
+        measure("start_job()", start_job, workspace.run_stats, longest, results, quiet)
+
+        # The runs are throttled by the helper, the last run's end therefore bounds the scripted time
+        span = lambda new: max(entry["end"] for entry in new) - min(entry["start"] for entry in new)
+        job_runs = measure(f"start_job_runs({args.runs})", lambda: DA.start_job_runs(args.runs, min_interval=args.min_interval,
+                                                                                   max_interval=args.max_interval),
+                           workspace.run_stats, span, results, quiet)
+
+    print(f"\nupdates: {args.queued_seconds}s queued, {args.initializing_seconds}s initializing, {args.running_seconds}s running; "
+          f"job tasks: {args.setup_seconds}s setup + {args.task_seconds}s; {args.latency_ms} ms per request\n")
+    print(f"{'operation':<34}{'wall (s)':>10}{'scripted (s)':>14}{'overhead (s)':>14}{'polls':>7}{'wasted':>8}{'max lag (s)':>13}")
+    print("-" * 100)
+    for r in results:
+        print(f"{r['label']:<34}{r['wall']:>10.2f}{r['scripted']:>14.2f}{r['wall'] - r['scripted']:>14.2f}"
+              f"{r['polls']:>7}{r['wasted']:>8}{r['lag']:>13.2f}")
+
+    print(f"\npeak concurrent requests: {workspace.peak_in_flight}, injected errors: {dict(workspace.injected_errors)}")
+    print(f"requests: {dict(sorted(workspace.requests.items()))}\n")
+    print(f"start_job_runs({args.runs}), {args.max_concurrent_runs} at a time: job duration p50 "
+          f"{job_runs['summary']['job']['p50']:.2f}s, p95 {job_runs['summary']['job']['p95']:.2f}s\n")
+    DA.print_rest_latencies()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Offline benchmark of the classroom-setup path (install_datasets, validate_datasets,
+list_r, cleanup and DataFactory.load) against a synthetic dataset tree, using the
+local stand-ins in local_databricks.py.
+
+Usage:
+    python bench_setup.py --batches 31 --file-kb 64 --latency-ms 20 --repeat 3
+    python bench_setup.py --includes "../../5.to go/End-to-End-ETL-with-Databricks-v1.0.0/Includes"
+"""
+import os
+import io
+import time
+import json
+import shutil
+import argparse
+import tempfile
+import statistics
+import contextlib
+
+import local_databricks
+
+DATASETS = ["customers", "orders", "status"]
+
+
+def create_synthetic_datasets(fs, uri, batches, file_kb):
+    """Writes <dataset>/<NN>.json for every dataset, each file being roughly file_kb in size."""
+    root = fs.local_path(uri)
+    for dataset in DATASETS:
+        os.makedirs(os.path.join(root, dataset), exist_ok=True)
+        for batch in range(batches):
+            record = json.dumps({"batch": batch, "dataset": dataset, "padding": "x" * 100})
+            lines = "\n".join([record] * max(1, (file_kb * 1024) // (len(record) + 1)))
+            with open(os.path.join(root, dataset, f"{batch:02}.json"), "w") as f:
+                f.write(lines)
+
+
+def load_helpers(args, fs, spark):
+    """Executes the Includes notebooks against the stand-ins and returns their namespace."""
+    local_databricks.install_dbacademy_stubs("/Repos/bench/4.workflow/Task-1-Create-Tables")
+    namespace = local_databricks.create_namespace(fs, spark)
+    local_databricks.run_notebook(os.path.join(args.includes, "_utility-functions.py"), namespace)
+
+    pipeline_config = os.path.join(args.includes, "_pipeline_config.py")
+    if os.path.exists(pipeline_config):
+        local_databricks.run_notebook(pipeline_config, namespace)
+    return namespace
+
+
+def timed(label, function, repeat, results, setup=None, quiet=True):
+    durations = []
+    for _ in range(repeat):
+        if setup is not None:
+            with contextlib.redirect_stdout(io.StringIO()):
+                setup()
+        output = io.StringIO() if quiet else None
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+            function()
+        durations.append(time.perf_counter() - start)
+    results.append((label, durations))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the DBAcademyHelper setup path offline")
+    parser.add_argument("--includes", type=str, default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Includes"))
+    parser.add_argument("--batches", type=int, default=31, help="files per dataset")
+    parser.add_argument("--file-kb", type=int, default=16, help="approximate size of each file")
+    parser.add_argument("--latency-ms", type=float, default=10, help="simulated latency of every dbutils.fs call")
+    parser.add_argument("--throughput-mbps", type=float, default=None, help="simulated copy throughput")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-pyspark", action="store_true", help="use the SQL stand-in even if PySpark is installed")
+    parser.add_argument("--root", type=str, default=None, help="directory backing dbutils.fs, defaults to a temp dir")
+    parser.add_argument("--verbose", action="store_true", help="show the output of the helpers")
+    args = parser.parse_args()
+
+    root = args.root or tempfile.mkdtemp(prefix="dbacademy-bench-")
+    fs = local_databricks.LocalFileSystem(root, latency_ms=0)
+    spark = local_databricks.create_spark(fs, "bench@example.com", use_pyspark=not args.no_pyspark)
+
+    namespace = load_helpers(args, fs, spark)
+    DA = namespace["DBAcademyHelper"](lesson=None, asynchronous=False)
+    namespace["DA"] = DA
+    DA.paths.storage_location = f"{DA.paths.working_dir}/output"
+
+    create_synthetic_datasets(fs, DA.data_source_uri, args.batches, args.file_kb)
+    fs.latency_ms = args.latency_ms
+    fs.throughput_mbps = args.throughput_mbps
+
+    quiet = not args.verbose
+    results = []
+    try:
+        timed("install_datasets(reinstall=True)", lambda: DA.install_datasets(reinstall=True), args.repeat, results, quiet=quiet)
+        timed("validate_datasets()", lambda: DA.validate_datasets(fail_fast=True), args.repeat, results, quiet=quiet)
+        timed("list_r(datasets)", lambda: DA.list_r(DA.hidden.datasets), args.repeat, results, quiet=quiet)
+
+        if "DataFactory" in namespace:
+            factory = {}
+            def new_factory():
+                DA.init(create_db=False)
+                fs.rm(f"{DA.paths.working_dir}/stream-source", True)
+                factory["instance"] = namespace["DataFactory"]()
+            timed("DataFactory()", new_factory, args.repeat, results, quiet=quiet)
+            timed("DataFactory.load()", lambda: factory["instance"].load(), args.repeat, results, setup=new_factory, quiet=quiet)
+            timed("DataFactory.load_all()", lambda: factory["instance"].load_all(), args.repeat, results, setup=new_factory, quiet=quiet)
+
+        timed("cleanup(validate=False)", lambda: DA.cleanup(validate=False), args.repeat, results,
+              setup=lambda: (DA.init(create_db=True), fs.put(f"{DA.paths.working_dir}/marker", "", True)), quiet=quiet)
+    finally:
+        if args.root is None:
+            shutil.rmtree(root, ignore_errors=True)
+
+    files = args.batches * len(DATASETS)
+    print(f"\n{files} files of ~{args.file_kb} KB, {args.latency_ms} ms per dbutils.fs call, {args.repeat} runs\n")
+    print(f"{'operation':<36}{'min (s)':>10}{'median (s)':>12}{'max (s)':>10}")
+    print("-" * 68)
+    for label, durations in results:
+        print(f"{label:<36}{min(durations):>10.3f}{statistics.median(durations):>12.3f}{max(durations):>10.3f}")
+    print(f"\ndbutils.fs calls: {dict(fs.calls)}")
+
+
+if __name__ == "__main__":
+    main()
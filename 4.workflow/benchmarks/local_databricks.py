@@ -0,0 +1,570 @@
+"""
+Local stand-ins for the Databricks globals used by the classroom-setup notebooks
+(dbutils, spark, displayHTML, dbacademy.dbgems and dbacademy.dbrest) so that the
+helpers defined in Includes/ can be executed and timed outside of a workspace.
+
+dbutils.fs is backed by a local directory: every URI (dbfs:/..., wasbs://...) is
+mapped to <root>/<scheme>/<authority>/<path> and every call sleeps for a simulated
+latency. spark is backed by local-mode PySpark when it is installed, otherwise by a
+minimal stand-in that only answers the statements the setup helpers issue. The REST
+client talks to any endpoint implementing the Databricks API, e.g. mock_rest_server.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import types
+import threading
+import http.client
+from urllib.parse import urlparse, urlencode
+from collections import namedtuple, defaultdict
+
+
+class FileInfo(namedtuple("FileInfo", ["path", "name", "size", "modificationTime"])):
+    """Mirrors dbutils.fs.ls() results: directories have a trailing slash and a size of 0."""
+
+    def isDir(self):
+        return self.name.endswith("/")
+
+    def isFile(self):
+        return not self.isDir()
+
+
+class LocalFileSystem:
+    """
+    The subset of dbutils.fs used by the helpers, backed by a local directory.
+
+    latency_ms is slept once per call and throughput_mbps, when specified, adds a
+    per-byte cost to copies to simulate cross-region transfers.
+    """
+
+    def __init__(self, root, latency_ms=0, throughput_mbps=None):
+        self.root = os.path.abspath(root)
+        self.latency_ms = latency_ms
+        self.throughput_mbps = throughput_mbps
+        self.calls = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def local_path(self, uri):
+        """Maps a URI such as dbfs:/a/b or wasbs://container@host/a/b to a local path."""
+        if uri.startswith("/dbfs/"):
+            uri = "dbfs:/" + uri[len("/dbfs/"):]
+        match = re.match(r"^([a-zA-Z0-9]+):/+(.*)$", uri)
+        scheme, rest = match.groups() if match else ("dbfs", uri.lstrip("/"))
+        return os.path.join(self.root, scheme, rest.rstrip("/"))
+
+    def _call(self, name):
+        with self._lock:
+            self.calls[name] += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+
+    def _transfer(self, num_bytes):
+        if self.throughput_mbps:
+            time.sleep(num_bytes / (self.throughput_mbps * 1024 * 1024))
+
+    def ls(self, uri):
+        self._call("ls")
+        path = self.local_path(uri)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"java.io.FileNotFoundException: File {uri} does not exist.")
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            return [FileInfo(uri, os.path.basename(path), stat.st_size, int(stat.st_mtime * 1000))]
+
+        base = uri.rstrip("/")
+        results = []
+        for name in sorted(os.listdir(path)):
+            full = os.path.join(path, name)
+            stat = os.stat(full)
+            if os.path.isdir(full):
+                results.append(FileInfo(f"{base}/{name}/", f"{name}/", 0, int(stat.st_mtime * 1000)))
+            else:
+                results.append(FileInfo(f"{base}/{name}", name, stat.st_size, int(stat.st_mtime * 1000)))
+        return results
+
+    def cp(self, source, target, recurse=False):
+        self._call("cp")
+        source, target = self.local_path(source), self.local_path(target)
+        if os.path.isdir(source):
+            if not recurse:
+                raise IOError(f"{source} is a directory, use recurse=True")
+            shutil.copytree(source, target, dirs_exist_ok=True)
+            self._transfer(sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(source) for f in files))
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(source, target)
+            self._transfer(os.path.getsize(source))
+        return True
+
+    def mv(self, source, target, recurse=False):
+        self._call("mv")
+        source, target = self.local_path(source), self.local_path(target)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(source, target)
+        return True
+
+    def rm(self, uri, recurse=False):
+        self._call("rm")
+        path = self.local_path(uri)
+        if os.path.isdir(path):
+            if not recurse:
+                raise IOError(f"{uri} is a directory, use recurse=True")
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+        else:
+            return False
+        return True
+
+    def mkdirs(self, uri):
+        self._call("mkdirs")
+        os.makedirs(self.local_path(uri), exist_ok=True)
+        return True
+
+    def put(self, uri, contents, overwrite=False):
+        self._call("put")
+        path = self.local_path(uri)
+        if os.path.exists(path) and not overwrite:
+            raise IOError(f"{uri} already exists")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(contents)
+        return True
+
+    def head(self, uri, max_bytes=65536):
+        self._call("head")
+        with open(self.local_path(uri)) as f:
+            return f.read(max_bytes)
+
+
+class _Conf:
+    def __init__(self, values=None):
+        self.values = dict(values or {})
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def set(self, key, value):
+        self.values[key] = value
+
+
+class _Result:
+    """Just enough of a DataFrame for the statements issued by the setup helpers."""
+
+    def __init__(self, rows=None):
+        self.rows = rows or []
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def collect(self):
+        return list(self.rows)
+
+    def count(self):
+        return len(self.rows)
+
+    def filter(self, condition):
+        return self
+
+    def select(self, *columns):
+        return self
+
+
+class StubSpark:
+    """
+    Minimal spark stand-in used when PySpark is not installed: records every SQL
+    statement, tracks CREATE/DROP DATABASE and answers current_user(), so that only
+    the dbutils.fs side of the setup path is measured.
+    """
+
+    def __init__(self, username, conf=None):
+        self.username = username
+        self.conf = _Conf(conf)
+        self.statements = []
+        self.databases = set()
+        self.catalog = types.SimpleNamespace(clearCache=lambda: None)
+        self.streams = types.SimpleNamespace(active=[], addListener=self._unsupported, removeListener=lambda l: None)
+
+    @staticmethod
+    def _unsupported(listener):
+        raise NotImplementedError("Streaming listeners are not supported by the stand-in")
+
+    def sql(self, statement):
+        self.statements.append(statement)
+        text = statement.strip()
+        upper = text.upper()
+        if "CURRENT_USER()" in upper:
+            return _Result([[self.username]])
+        if upper.startswith("CREATE DATABASE"):
+            self.databases.add(text.split()[-3] if " LOCATION " in upper else text.split()[-1])
+        elif upper.startswith("DROP DATABASE"):
+            self.databases.discard(text.split()[-2] if upper.endswith("CASCADE") else text.split()[-1])
+        elif upper.startswith("SHOW DATABASES LIKE"):
+            name = text.split("'")[1]
+            return _Result([[name]] if name in self.databases else [])
+        elif upper.startswith("SHOW DATABASES"):
+            return _Result([[name] for name in sorted(self.databases)])
+        return _Result()
+
+
+class LocalSpark:
+    """
+    Wraps a local-mode SparkSession, rewriting dbfs:/ locations in SQL statements to
+    the local file system used by LocalFileSystem. Every other attribute is delegated.
+    """
+
+    def __init__(self, session, fs):
+        self._session = session
+        self._fs = fs
+
+    def sql(self, statement):
+        statement = re.sub(r"'(dbfs:/[^']*)'", lambda m: "'file://" + self._fs.local_path(m.group(1)) + "'", statement)
+        return self._session.sql(statement)
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+def create_spark(fs, username, use_pyspark=True, conf=None):
+    """
+    Returns a LocalSpark backed by a local-mode SparkSession when PySpark is installed
+    and use_pyspark is True, otherwise a StubSpark.
+    """
+    if use_pyspark:
+        try:
+            from pyspark.sql import SparkSession
+        except ImportError:
+            print("PySpark is not installed, falling back to the SQL stand-in", file=sys.stderr)
+        else:
+            builder = (SparkSession.builder.master("local[*]")
+                       .appName("dbacademy-local")
+                       .config("spark.sql.warehouse.dir", fs.local_path("dbfs:/user/hive/warehouse"))
+                       .config("spark.ui.enabled", "false"))
+            for key, value in (conf or {}).items():
+                builder = builder.config(key, value)
+            try:
+                from delta import configure_spark_with_delta_pip
+            except ImportError:
+                print("delta-spark is not installed, Delta statements will fail", file=sys.stderr)
+            else:
+                builder = configure_spark_with_delta_pip(
+                    builder.config("spark.sql.extensions", "io.delta.sql.DeltaSparkSessionExtension")
+                           .config("spark.sql.catalog.spark_catalog", "org.apache.spark.sql.delta.catalog.DeltaCatalog"))
+            return LocalSpark(builder.getOrCreate(), fs)
+    return StubSpark(username, conf)
+
+
+class RestError(Exception):
+    def __init__(self, status, method, url, message):
+        super().__init__(f"{method} {url} failed with {status}: {message}")
+        self.status = status
+
+
+class LocalRestClient:
+    """
+    The subset of dbacademy.dbrest.DBAcademyRestClient used by the pipeline and job
+    helpers, plus the perform_query() of databricks_cli's ApiClient used by dlt_runner,
+    implemented with the standard library against the specified endpoint.
+
+    Every thread keeps its own keep-alive connection and GETs answered with 429 or 5xx
+    are retried with jittered exponential backoff, as with the pooled adapter mounted
+    by get_rest_client(). runs().wait_for() polls every poll_seconds, like dbacademy.
+    """
+
+    def __init__(self, endpoint, cluster_id="bench-cluster", poll_seconds=5, retries=5, backoff_factor=0.5):
+        self.endpoint = endpoint.rstrip("/")
+        self.cluster_id = cluster_id
+        self.poll_seconds = poll_seconds
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.connections = 0  # The number of connections opened, across all threads
+
+    def _connection(self):
+        if getattr(self._local, "connection", None) is None:
+            parsed = urlparse(self.endpoint)
+            connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=60)
+            connection.connect()
+            # Headers and body are sent separately, without this each request waits for a delayed ACK
+            connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._local.connection = connection
+            with self._lock:
+                self.connections += 1
+        return self._local.connection
+
+    def execute(self, method, url, params=None):
+        path = urlparse(url).path + (f"?{urlparse(url).query}" if urlparse(url).query else "")
+        body = None if params is None else json.dumps(params)
+        headers = {"Content-Type": "application/json"}
+
+        for attempt in range(self.retries + 1):
+            try:
+                connection = self._connection()
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                payload = response.read()
+            except (http.client.HTTPException, ConnectionError):
+                self._local.connection = None  # The server closed the connection, reconnect
+                if attempt == self.retries:
+                    raise
+                continue
+
+            if response.status == 200:
+                return json.loads(payload) if payload else {}
+            retryable = response.status == 429 or response.status >= 500
+            if method != "GET" or not retryable or attempt == self.retries:
+                message = json.loads(payload).get("message", "") if payload else ""
+                raise RestError(response.status, method, url, message)
+            time.sleep(self.backoff_factor * (2 ** attempt) * random.uniform(0.5, 1.0))
+
+    def execute_get_json(self, url):
+        return self.execute("GET", url)
+
+    def execute_post_json(self, url, params):
+        return self.execute("POST", url, params)
+
+    def execute_put_json(self, url, params):
+        return self.execute("PUT", url, params)
+
+    def execute_delete_json(self, url):
+        return self.execute("DELETE", url)
+
+    def perform_query(self, method, path, data=None, headers=None):
+        """The databricks_cli ApiClient flavour, relative to /api/2.0."""
+        url = f"{self.endpoint}/api/2.0{path}"
+        if method == "GET" and data:
+            return self.execute(method, f"{url}?{urlencode(data)}")
+        return self.execute(method, url, None if method in ["GET", "DELETE"] else (data or {}))
+
+    def pipelines(self):
+        return _PipelinesClient(self)
+
+    def jobs(self):
+        return _JobsClient(self)
+
+    def runs(self):
+        return _RunsClient(self)
+
+    def clusters(self):
+        return _ClustersClient(self)
+
+
+class _PipelinesClient:
+    def __init__(self, client):
+        self.client = client
+        self.base_uri = f"{client.endpoint}/api/2.0/pipelines"
+
+    def get_by_name(self, name):
+        query = urlencode({"filter": f"name LIKE '{name}'"})
+        statuses = self.client.execute_get_json(f"{self.base_uri}?{query}").get("statuses", [])
+        return next((status for status in statuses if status.get("name") == name), None)
+
+    def get_by_id(self, pipeline_id):
+        return self.client.execute_get_json(f"{self.base_uri}/{pipeline_id}")
+
+    def create(self, name, storage, target, continuous=False, development=True, configuration=None, notebooks=None):
+        return self.client.execute_post_json(self.base_uri, {
+            "name": name,
+            "storage": storage,
+            "target": target,
+            "continuous": continuous,
+            "development": development,
+            "configuration": configuration or {},
+            "libraries": [{"notebook": {"path": path}} for path in notebooks or []],
+        })
+
+    def delete_by_id(self, pipeline_id):
+        return self.client.execute_delete_json(f"{self.base_uri}/{pipeline_id}")
+
+    def delete_by_name(self, name):
+        pipeline = self.get_by_name(name)
+        if pipeline is not None:
+            self.delete_by_id(pipeline.get("pipeline_id"))
+
+    def start_by_id(self, pipeline_id, full_refresh=False):
+        return self.client.execute_post_json(f"{self.base_uri}/{pipeline_id}/updates", {"full_refresh": full_refresh})
+
+    def get_update_by_id(self, pipeline_id, update_id):
+        return self.client.execute_get_json(f"{self.base_uri}/{pipeline_id}/updates/{update_id}")
+
+
+class _JobsClient:
+    def __init__(self, client):
+        self.client = client
+        self.base_uri = f"{client.endpoint}/api/2.1/jobs"
+
+    def create(self, params):
+        return self.client.execute_post_json(f"{self.base_uri}/create", params)
+
+    def run_now(self, job_id):
+        return self.client.execute_post_json(f"{self.base_uri}/run-now", {"job_id": job_id})
+
+    def delete_by_name(self, job_names, success_only):
+        job_names = [job_names] if isinstance(job_names, str) else job_names
+        for name in job_names:
+            for job in self.client.execute_get_json(f"{self.base_uri}/list?{urlencode({'name': name})}").get("jobs", []):
+                self.client.execute_post_json(f"{self.base_uri}/delete", {"job_id": job["job_id"]})
+
+
+class _RunsClient:
+    def __init__(self, client):
+        self.client = client
+        self.base_uri = f"{client.endpoint}/api/2.1/jobs/runs"
+
+    def get(self, run_id):
+        return self.client.execute_get_json(f"{self.base_uri}/get?run_id={run_id}")
+
+    def wait_for(self, run_id):
+        while True:
+            response = self.get(run_id)
+            if response.get("state", {}).get("life_cycle_state") in ["TERMINATED", "INTERNAL_ERROR", "SKIPPED"]:
+                return response
+            time.sleep(self.client.poll_seconds)
+
+
+class _ClustersClient:
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, cluster_id):
+        return self.client.execute_get_json(f"{self.client.endpoint}/api/2.0/clusters/get?cluster_id={cluster_id}")
+
+    def get_current_spark_version(self):
+        return self.get(self.client.cluster_id).get("spark_version")
+
+    def get_current_instance_pool_id(self):
+        return self.get(self.client.cluster_id).get("instance_pool_id")
+
+    def get_current_node_type_id(self):
+        return self.get(self.client.cluster_id).get("node_type_id")
+
+
+def install_dbacademy_stubs(notebook_path, rest_client_factory=None):
+    """
+    Registers a dbacademy.dbgems module answering get_notebook_path() with the specified
+    path and, if rest_client_factory is specified, a dbacademy.dbrest module whose
+    DBAcademyRestClient() returns rest_client_factory().
+    """
+    dbgems = types.ModuleType("dbacademy.dbgems")
+    dbgems.get_notebook_path = lambda: notebook_path
+    dbacademy = sys.modules.setdefault("dbacademy", types.ModuleType("dbacademy"))
+    dbacademy.dbgems = dbgems
+    sys.modules["dbacademy.dbgems"] = dbgems
+
+    if rest_client_factory is not None:
+        dbrest = types.ModuleType("dbacademy.dbrest")
+        dbrest.DBAcademyRestClient = rest_client_factory
+        dbacademy.dbrest = dbrest
+        sys.modules["dbacademy.dbrest"] = dbrest
+
+
+def _entry_point(notebook_path):
+    """Answers dbutils.entry_point.getDbutils().notebook().getContext().notebookPath().getOrElse(None)."""
+    option = types.SimpleNamespace(getOrElse=lambda default: notebook_path)
+    context = types.SimpleNamespace(notebookPath=lambda: option)
+    notebook = types.SimpleNamespace(getContext=lambda: context)
+    return types.SimpleNamespace(getDbutils=lambda: types.SimpleNamespace(notebook=lambda: notebook))
+
+
+def create_namespace(fs, spark, notebook_path="/Repos/bench/4.workflow/notebook", arguments=None):
+    """
+    Returns the globals of a notebook, at the specified path, executed against the
+    specified stand-ins and with the specified arguments as the values of its widgets.
+    """
+    arguments = dict(arguments or {})
+    widgets = types.SimpleNamespace(getArgument=lambda name, default=None: arguments.get(name, default),
+                                    get=lambda name: arguments[name])
+    namespace = {
+        "__name__": "__notebook__",
+        "dbutils": types.SimpleNamespace(fs=fs, entry_point=_entry_point(notebook_path), widgets=widgets,
+                                         notebook=types.SimpleNamespace(exit=_notebook_exit)),
+        "spark": spark,
+        "displayHTML": lambda html: None,
+    }
+    return namespace
+
+
+def run_notebook(path, namespace):
+    """
+    Executes the Python cells of a notebook source file in the specified namespace,
+    emulating a %run into the caller. Magic commands (%run, %pip, ...) are comments
+    in the source format and are therefore ignored - callers run dependencies first.
+    """
+    with open(path) as f:
+        source = f.read()
+    exec(compile(source, path, "exec"), namespace)
+
+    # Reads through the /dbfs/ FUSE mount are redirected to the local file system
+    if "_fuse_path" in namespace:
+        namespace["_fuse_path"] = namespace["dbutils"].fs.local_path
+    return namespace
+
+
+class NotebookExit(Exception):
+    """Raised by the dbutils.notebook.exit() stand-in to end the notebook being run."""
+
+    def __init__(self, value):
+        super().__init__(value)
+        self.value = value
+
+
+def _notebook_exit(value):
+    raise NotebookExit(value)
+
+
+def notebook_cells(path):
+    """
+    Returns the cells of a notebook source file as (language, source) tuples, where
+    language is "sql", "python" or the name of any other magic command (md, run, ...).
+    """
+    with open(path) as f:
+        cells = f.read().split("# COMMAND ----------")
+
+    results = []
+    for cell in cells:
+        cell = cell.replace("# Databricks notebook source", "", 1).strip()
+        lines = [line[len("# MAGIC "):] for line in cell.splitlines() if line.startswith("# MAGIC")]
+        if lines and lines[0].startswith("%"):
+            results.append((lines[0].split()[0][1:], "\n".join(lines[1:]).strip()))
+        elif cell:
+            results.append(("python", cell))
+    return results
+
+
+def sql_cells(path):
+    """Returns the statement of every %sql cell of a notebook source file, in order."""
+    return [source.rstrip(";") for language, source in notebook_cells(path) if language == "sql"]
+
+
+def run_sql_notebook(path, spark, substitutions=None, arguments=None, namespace=None):
+    """
+    Executes the %sql cells of a notebook source file with the specified spark session,
+    replacing ${key} with substitutions[key] and getArgument('name') with the quoted
+    arguments[name]. Widgets are not supported, so CREATE WIDGET statements are skipped.
+
+    When a namespace is specified, see create_namespace(), the Python cells are executed
+    in it too, in order, until one calls dbutils.notebook.exit(). Other magic commands,
+    %run included, are ignored. Returns the results of the SQL statements.
+    """
+    results = []
+    for language, source in notebook_cells(path):
+        if language == "python" and namespace is not None:
+            try:
+                exec(compile(source, path, "exec"), namespace)
+            except NotebookExit:
+                break
+        elif language == "sql":
+            statement = source.rstrip(";")
+            if re.match(r"^\s*CREATE\s+WIDGET", statement, re.IGNORECASE):
+                continue
+            for key, value in (substitutions or {}).items():
+                statement = statement.replace("${" + key + "}", str(value))
+            statement = re.sub(r"getArgument\('([^']*)'\)", lambda m: f"'{(arguments or {})[m.group(1)]}'", statement)
+            results.append(spark.sql(statement))
+    return results
@@ -0,0 +1,552 @@
+"""
+A local mock of the Databricks REST endpoints used by the pipeline and job helpers
+(create_pipeline, start_pipelines, create_job, start_job) and by dlt_runner/dlt_monitor.
+
+Pipeline updates and job runs follow scripted state machines instead of doing any
+work: a Scenario defines how long each state lasts, how likely the final state is a
+failure and how likely a poll is answered with a transient 429/503. Scenarios are
+matched to pipelines and jobs by name so that one server can host fast, slow and
+failing resources side by side.
+
+    with MockRestServer(Scenario(running_seconds=2)) as server:
+        server.script("*Slow*", Scenario(running_seconds=10))
+        client = local_databricks.LocalRestClient(server.endpoint)
+
+All state is in memory and derived from the time elapsed since each update or run
+was started, so no background threads are needed besides the HTTP server itself.
+"""
+import re
+import json
+import time
+import random
+import fnmatch
+import threading
+from collections import defaultdict
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PIPELINE_TERMINAL_STATES = ["COMPLETED", "FAILED", "CANCELED"]
+RUN_TERMINAL_STATES = ["TERMINATED", "SKIPPED", "INTERNAL_ERROR"]
+
+
+class Scenario:
+    """
+    The scripted behaviour of the pipeline updates and job runs it is matched to.
+
+    Pipeline updates are QUEUED, INITIALIZING and then RUNNING for the specified
+    seconds before ending COMPLETED, or FAILED with probability failure_rate. Job runs
+    are PENDING for queued_seconds, after which every task spends setup_seconds
+    acquiring its cluster and task_seconds (or task_durations[task_key]) running,
+    once the tasks it depends on have succeeded. A task fails with probability
+    failure_rate, which fails the run and skips the tasks downstream of it.
+
+    error_rate is the probability that a GET is answered with a transient 429 or 503
+    and latency_ms is added to every request. Both apply server-wide and are therefore
+    only read from the server's default scenario.
+    """
+
+    def __init__(self, queued_seconds=0.5, initializing_seconds=0.5, running_seconds=2.0,
+                 setup_seconds=0.5, task_seconds=1.0, task_durations=None,
+                 failure_rate=0.0, error_rate=0.0, latency_ms=0):
+        self.queued_seconds = queued_seconds
+        self.initializing_seconds = initializing_seconds
+        self.running_seconds = running_seconds
+        self.setup_seconds = setup_seconds
+        self.task_seconds = task_seconds
+        self.task_durations = dict(task_durations or {})
+        self.failure_rate = failure_rate
+        self.error_rate = error_rate
+        self.latency_ms = latency_ms
+
+    def update_duration(self):
+        """The seconds between starting a pipeline update and it reaching its final state."""
+        return self.queued_seconds + self.initializing_seconds + self.running_seconds
+
+
+class HttpError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+def _ms(seconds):
+    return int(seconds * 1000)
+
+
+class MockDatabricks:
+    """The in-memory workspace behind MockRestServer, usable directly for tests."""
+
+    def __init__(self, scenario=None, seed=None, cluster=None):
+        self.default_scenario = scenario or Scenario()
+        self.scenarios = []  # (name pattern, scenario), first match wins
+        self.random = random.Random(seed)
+        self.cluster = cluster or {
+            "cluster_id": "bench-cluster",
+            "spark_version": "10.4.x-scala2.12",
+            "node_type_id": "i3.xlarge",
+        }
+
+        self.lock = threading.RLock()
+        self.next_id = 1
+        self.pipelines = {}  # pipeline_id -> {"spec", "updates": [update, ...]}
+        self.jobs = {}       # job_id -> {"settings", "created_time"}
+        self.runs = {}       # run_id -> run timeline, see _schedule_run()
+
+        self.requests = defaultdict(int)       # "GET /api/2.0/..." -> count
+        self.injected_errors = defaultdict(int)
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    # ------------------------------------------------------------------ scripting
+
+    def script(self, pattern, scenario):
+        """Uses the scenario for every pipeline or job whose name matches the fnmatch pattern."""
+        with self.lock:
+            self.scenarios.append((pattern, scenario))
+
+    def scenario_for(self, name):
+        for pattern, scenario in self.scenarios:
+            if fnmatch.fnmatchcase(name or "", pattern):
+                return scenario
+        return self.default_scenario
+
+    def _new_id(self):
+        with self.lock:
+            value = self.next_id
+            self.next_id += 1
+            return value
+
+    # ------------------------------------------------------------------ pipelines
+
+    def list_pipelines(self, query):
+        # The helpers filter by exact name with "name LIKE '<name>'"
+        name_filter = query.get("filter", [None])[0]
+        name = None
+        if name_filter and "LIKE" in name_filter.upper():
+            name = name_filter.split("'")[1]
+        with self.lock:
+            statuses = [{"pipeline_id": pipeline_id,
+                         "name": pipeline["spec"]["name"],
+                         "state": self._pipeline_state(pipeline)}
+                        for pipeline_id, pipeline in self.pipelines.items()
+                        if name is None or fnmatch.fnmatchcase(pipeline["spec"]["name"], name.replace("%", "*"))]
+        return {"statuses": statuses}
+
+    def create_pipeline(self, spec):
+        with self.lock:
+            if any(pipeline["spec"]["name"] == spec.get("name") for pipeline in self.pipelines.values()):
+                raise HttpError(400, f"A pipeline with name '{spec.get('name')}' already exists")
+            pipeline_id = f"pipeline-{self._new_id():04}"
+            self.pipelines[pipeline_id] = {"spec": {**spec, "id": pipeline_id}, "updates": []}
+        return {"pipeline_id": pipeline_id}
+
+    def _pipeline(self, pipeline_id):
+        if pipeline_id not in self.pipelines:
+            raise HttpError(404, f"Pipeline {pipeline_id} does not exist")
+        return self.pipelines[pipeline_id]
+
+    def get_pipeline(self, pipeline_id):
+        with self.lock:
+            pipeline = self._pipeline(pipeline_id)
+            latest = [{"update_id": update["update_id"], "state": self._update_state(update)}
+                      for update in reversed(pipeline["updates"][-5:])]
+            return {"pipeline_id": pipeline_id,
+                    "name": pipeline["spec"]["name"],
+                    "spec": json.loads(json.dumps(pipeline["spec"])),
+                    "state": self._pipeline_state(pipeline),
+                    "latest_updates": latest}
+
+    def edit_pipeline(self, pipeline_id, spec):
+        with self.lock:
+            pipeline = self._pipeline(pipeline_id)
+            if spec.get("storage") != pipeline["spec"].get("storage"):
+                raise HttpError(400, "The storage location of a pipeline cannot be changed")
+            pipeline["spec"] = {**spec, "id": pipeline_id}
+        return {}
+
+    def delete_pipeline(self, pipeline_id):
+        with self.lock:
+            self._pipeline(pipeline_id)
+            del self.pipelines[pipeline_id]
+        return {}
+
+    def start_update(self, pipeline_id, request):
+        now = time.time()
+        with self.lock:
+            pipeline = self._pipeline(pipeline_id)
+            if pipeline["updates"] and self._update_state(pipeline["updates"][-1]) not in PIPELINE_TERMINAL_STATES:
+                raise HttpError(409, f"An active update already exists for pipeline {pipeline_id}")
+
+            scenario = self.scenario_for(pipeline["spec"]["name"])
+            timeline, elapsed = [], 0
+            for state, seconds in [("QUEUED", scenario.queued_seconds),
+                                   ("INITIALIZING", scenario.initializing_seconds),
+                                   ("RUNNING", scenario.running_seconds)]:
+                timeline.append((state, now + elapsed))
+                elapsed += seconds
+            final_state = "FAILED" if self.random.random() < scenario.failure_rate else "COMPLETED"
+            timeline.append((final_state, now + elapsed))
+
+            update = {
+                "update_id": f"update-{self._new_id():04}",
+                "pipeline_id": pipeline_id,
+                "full_refresh": bool(request.get("full_refresh", False)),
+                "refresh_selection": request.get("refresh_selection", []),
+                "timeline": timeline,
+                "polls": [],  # (time, state) of every GET of this update
+            }
+            pipeline["updates"].append(update)
+        return {"update_id": update["update_id"]}
+
+    def get_update(self, pipeline_id, update_id):
+        now = time.time()
+        with self.lock:
+            pipeline = self._pipeline(pipeline_id)
+            update = next((u for u in pipeline["updates"] if u["update_id"] == update_id), None)
+            if update is None:
+                raise HttpError(404, f"Update {update_id} does not exist")
+            state = self._update_state(update, now)
+            update["polls"].append((now, state))
+            return {"update": {"pipeline_id": pipeline_id,
+                               "update_id": update_id,
+                               "state": state,
+                               "full_refresh": update["full_refresh"],
+                               "creation_time": _ms(update["timeline"][0][1])}}
+
+    @staticmethod
+    def _update_state(update, now=None):
+        now = time.time() if now is None else now
+        current = update["timeline"][0][0]
+        for state, since in update["timeline"]:
+            if now >= since:
+                current = state
+        return current
+
+    def _pipeline_state(self, pipeline):
+        if pipeline["updates"] and self._update_state(pipeline["updates"][-1]) not in PIPELINE_TERMINAL_STATES:
+            return "RUNNING"
+        return "IDLE"
+
+    # ------------------------------------------------------------------ jobs
+
+    def list_jobs(self, query):
+        name = query.get("name", [None])[0]
+        with self.lock:
+            jobs = [{"job_id": job_id, "settings": job["settings"], "created_time": job["created_time"]}
+                    for job_id, job in self.jobs.items()
+                    if name is None or job["settings"].get("name") == name]
+        return {"jobs": jobs, "has_more": False}
+
+    def create_job(self, settings):
+        with self.lock:
+            job_id = self._new_id()
+            self.jobs[job_id] = {"settings": settings, "created_time": _ms(time.time())}
+        return {"job_id": job_id}
+
+    def _job(self, job_id):
+        if job_id not in self.jobs:
+            raise HttpError(400, f"Job {job_id} does not exist")
+        return self.jobs[job_id]
+
+    def get_job(self, job_id):
+        with self.lock:
+            job = self._job(job_id)
+            return {"job_id": job_id, "settings": job["settings"], "created_time": job["created_time"]}
+
+    def delete_job(self, request):
+        with self.lock:
+            self._job(request.get("job_id"))
+            del self.jobs[request.get("job_id")]
+        return {}
+
+    def run_now(self, request):
+        now = time.time()
+        with self.lock:
+            job_id = request.get("job_id")
+            job = self._job(job_id)
+            run_id = self._new_id()
+            self.runs[run_id] = self._schedule_run(job_id, job["settings"], run_id, now)
+            return {"run_id": run_id, "number_in_job": run_id}
+
+    def _schedule_run(self, job_id, settings, run_id, now):
+        """
+        Computes the whole timeline of a run when it is triggered: when it gets one of
+        the job's max_concurrent_runs slots (it is skipped if none is free and queueing
+        is not enabled) and then when each task starts, is set up and ends.
+        """
+        scenario = self.scenario_for(settings.get("name"))
+        max_concurrent = settings.get("max_concurrent_runs", 1)
+        active = [run for run in self.runs.values()
+                  if run["job_id"] == job_id and not run["skipped"] and run["end"] > now]
+
+        # The run starts once fewer than max_concurrent_runs other runs are active
+        slot = now
+        for candidate in [now] + sorted(run["end"] for run in active):
+            if sum(1 for run in active if run["start"] <= candidate < run["end"]) < max_concurrent:
+                slot = candidate
+                break
+
+        run = {"run_id": run_id, "job_id": job_id, "name": settings.get("name"),
+               "triggered": now, "start": max(slot, now), "end": max(slot, now),
+               "skipped": False, "tasks": {}, "polls": []}
+
+        if slot > now and not settings.get("queue", {}).get("enabled", False):
+            run["skipped"] = True
+            return run
+
+        start = run["start"] + scenario.queued_seconds
+        tasks = {task["task_key"]: task for task in settings.get("tasks", [])}
+        remaining = list(tasks)
+        while remaining:
+            progressed = False
+            for task_key in list(remaining):
+                depends_on = [d["task_key"] for d in tasks[task_key].get("depends_on", [])]
+                if any(d in remaining for d in depends_on):
+                    continue
+                upstream = [run["tasks"][d] for d in depends_on]
+                task = {"task_key": task_key, "depends_on": depends_on}
+                if any(u["result"] != "SUCCESS" for u in upstream):
+                    ready = max([u["end"] for u in upstream] + [start])
+                    task.update(start=ready, setup_end=ready, end=ready, result="UPSTREAM_FAILED")
+                else:
+                    ready = max([u["end"] for u in upstream] + [start])
+                    setup_end = ready + scenario.setup_seconds
+                    end = setup_end + scenario.task_durations.get(task_key, scenario.task_seconds)
+                    result = "FAILED" if self.random.random() < scenario.failure_rate else "SUCCESS"
+                    task.update(start=ready, setup_end=setup_end, end=end, result=result)
+                run["tasks"][task_key] = task
+                remaining.remove(task_key)
+                progressed = True
+            if not progressed:
+                raise HttpError(400, f"The tasks {remaining} have circular or unknown dependencies")
+
+        run["end"] = max([task["end"] for task in run["tasks"].values()] + [start])
+        return run
+
+    def get_run(self, run_id):
+        now = time.time()
+        with self.lock:
+            if run_id not in self.runs:
+                raise HttpError(400, f"Run {run_id} does not exist")
+            run = self.runs[run_id]
+
+            if run["skipped"]:
+                life_cycle_state, result_state = "SKIPPED", None
+            elif now < run["start"] or now < min([t["start"] for t in run["tasks"].values()] + [run["end"]]):
+                life_cycle_state, result_state = "PENDING", None
+            elif now < run["end"]:
+                life_cycle_state, result_state = "RUNNING", None
+            else:
+                failed = any(t["result"] != "SUCCESS" for t in run["tasks"].values())
+                life_cycle_state, result_state = "TERMINATED", "FAILED" if failed else "SUCCESS"
+            run["polls"].append((now, life_cycle_state))
+
+            tasks = []
+            for task in run["tasks"].values():
+                if now < task["start"] or run["skipped"]:
+                    task_state = {"life_cycle_state": "PENDING"}
+                elif task["result"] == "UPSTREAM_FAILED":
+                    task_state = {"life_cycle_state": "SKIPPED", "result_state": "UPSTREAM_FAILED"}
+                elif now < task["end"]:
+                    task_state = {"life_cycle_state": "RUNNING"}
+                else:
+                    task_state = {"life_cycle_state": "TERMINATED", "result_state": task["result"]}
+                done = now >= task["end"]
+                tasks.append({
+                    "task_key": task["task_key"],
+                    "depends_on": [{"task_key": d} for d in task["depends_on"]],
+                    "state": task_state,
+                    "start_time": _ms(task["start"]) if now >= task["start"] else 0,
+                    "setup_duration": _ms(task["setup_end"] - task["start"]) if done else 0,
+                    "execution_duration": _ms(task["end"] - task["setup_end"]) if done else 0,
+                    "cleanup_duration": 0,
+                    "end_time": _ms(task["end"]) if done else 0,
+                })
+
+            state = {"life_cycle_state": life_cycle_state, "state_message": ""}
+            if result_state is not None:
+                state["result_state"] = result_state
+            return {"job_id": run["job_id"],
+                    "run_id": run_id,
+                    "run_name": run["name"],
+                    "state": state,
+                    "start_time": _ms(run["triggered"]),
+                    "queue_duration": _ms(run["start"] - run["triggered"]),
+                    "end_time": _ms(run["end"]) if life_cycle_state in RUN_TERMINAL_STATES else 0,
+                    "tasks": tasks}
+
+    # ------------------------------------------------------------------ dispatch
+
+    def handle(self, method, url, body):
+        """Routes one request, returning the JSON response or raising an HttpError."""
+        parsed = urlparse(url)
+        path, query = parsed.path.rstrip("/"), parse_qs(parsed.query)
+        parts = path.split("/")[3:]  # Without "", "api" and the version
+        endpoint = f"{method} {re.sub(r'/(pipeline-|update-)?[0-9]+(?=/|$)', '/{id}', path)}"
+
+        with self.lock:
+            self.requests[endpoint] += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            scenario = self.default_scenario
+            if scenario.latency_ms:
+                time.sleep(scenario.latency_ms / 1000.0)
+            if method == "GET" and scenario.error_rate and self.random.random() < scenario.error_rate:
+                status = self.random.choice([429, 503])
+                with self.lock:
+                    self.injected_errors[status] += 1
+                raise HttpError(status, "Injected transient error", {"Retry-After": "0"})
+            return self._route(method, parts, query, body)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def _route(self, method, parts, query, body):
+        if parts[:1] == ["pipelines"]:
+            if len(parts) == 1 and method == "GET":
+                return self.list_pipelines(query)
+            if len(parts) == 1 and method == "POST":
+                return self.create_pipeline(body)
+            if len(parts) == 2 and method == "GET":
+                return self.get_pipeline(parts[1])
+            if len(parts) == 2 and method == "PUT":
+                return self.edit_pipeline(parts[1], body)
+            if len(parts) == 2 and method == "DELETE":
+                return self.delete_pipeline(parts[1])
+            if len(parts) == 3 and parts[2] == "updates" and method == "POST":
+                return self.start_update(parts[1], body)
+            if len(parts) == 4 and parts[2] == "updates" and method == "GET":
+                return self.get_update(parts[1], parts[3])
+
+        elif parts[:1] == ["jobs"]:
+            action = "/".join(parts[1:])
+            if action == "list" and method == "GET":
+                return self.list_jobs(query)
+            if action == "get" and method == "GET":
+                return self.get_job(int(query.get("job_id", [0])[0]))
+            if action == "create" and method == "POST":
+                return self.create_job(body)
+            if action == "delete" and method == "POST":
+                return self.delete_job(body)
+            if action == "run-now" and method == "POST":
+                return self.run_now(body)
+            if action == "runs/get" and method == "GET":
+                return self.get_run(int(query.get("run_id", [0])[0]))
+
+        elif parts == ["clusters", "get"] and method == "GET":
+            return dict(self.cluster)
+
+        raise HttpError(404, f"No mock for {method} /{'/'.join(parts)}")
+
+    # ------------------------------------------------------------------ reporting
+
+    def update_stats(self):
+        """Per pipeline update: polls, polls that did not observe a new state and the detection lag."""
+        with self.lock:
+            updates = [u for p in self.pipelines.values() for u in p["updates"]]
+            return [self._poll_stats(u["update_id"], u["timeline"], u["polls"], PIPELINE_TERMINAL_STATES) for u in updates]
+
+    def run_stats(self):
+        """Per job run: polls, polls that did not observe a new state and the detection lag."""
+        with self.lock:
+            stats = []
+            for run in self.runs.values():
+                timeline = [("SKIPPED", run["triggered"])] if run["skipped"] else [
+                    ("PENDING", run["triggered"]),
+                    ("RUNNING", min([t["start"] for t in run["tasks"].values()] + [run["end"]])),
+                    ("TERMINATED", run["end"])]
+                stats.append(self._poll_stats(run["run_id"], timeline, run["polls"], RUN_TERMINAL_STATES))
+            return stats
+
+    @staticmethod
+    def _poll_stats(key, timeline, polls, terminal_states):
+        wasted, previous = 0, None
+        for _, state in polls:
+            if state == previous:
+                wasted += 1
+            previous = state
+        terminal_at = timeline[-1][1]
+        observed_at = next((at for at, state in polls if state in terminal_states), None)
+        return {"id": key,
+                "start": timeline[0][1],
+                "end": terminal_at,
+                "duration": terminal_at - timeline[0][1],
+                "polls": len(polls),
+                "wasted_polls": wasted,
+                "lag": None if observed_at is None else max(0.0, observed_at - terminal_at)}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, so that clients can reuse their connections
+    disable_nagle_algorithm = True
+
+    def _dispatch(self, method):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            body = json.loads(raw) if raw else {}
+            status, headers, response = 200, {}, self.server.workspace.handle(method, self.path, body)
+        except HttpError as e:
+            status, headers, response = e.status, e.headers, {"error_code": str(e.status), "message": str(e)}
+        except Exception as e:
+            status, headers, response = 500, {}, {"error_code": "INTERNAL_ERROR", "message": repr(e)}
+
+        payload = json.dumps(response).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockRestServer:
+    """Serves a MockDatabricks on 127.0.0.1 from a background thread."""
+
+    def __init__(self, scenario=None, seed=None, port=0):
+        self.workspace = MockDatabricks(scenario, seed=seed)
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._server.workspace = self.workspace
+        self._thread = None
+
+    @property
+    def endpoint(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def script(self, pattern, scenario):
+        self.workspace.script(pattern, scenario)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-databricks", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
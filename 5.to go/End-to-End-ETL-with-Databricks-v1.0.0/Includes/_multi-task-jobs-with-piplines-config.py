@@ -1,17 +1,59 @@
 # Databricks notebook source
 class TaskConfig():
-    def __init__(self, name, resource_type, resource, pipeline_id=None, depends_on=[], cluster="shared_cluster"):
+    def __init__(self, name, resource_type, resource, pipeline_id=None, depends_on=[], cluster="shared_cluster", parameters={}):
         self.name = name
         self.resource = resource
         self.pipeline_id = pipeline_id
         self.resource_type = resource_type
         self.depends_on = depends_on
         self.cluster = cluster
+        self.parameters = parameters    # The notebook's parameters, i.e. the values of its widgets
+
+class ClusterConfig():
+    def __init__(self, key, num_workers=0, min_workers=None, max_workers=None, photon=False, instance_pool_id=None, node_type_id=None, spark_conf={}):
+        self.key = key                              # The job_cluster_key by which tasks refer to this cluster
+        self.num_workers = num_workers              # Zero for a single-node cluster, ignored when autoscaling
+        self.min_workers = min_workers              # Autoscale between min_workers and max_workers when both are specified
+        self.max_workers = max_workers
+        self.photon = photon                        # Use the Photon runtime engine
+        self.instance_pool_id = instance_pool_id    # Defaults to the current cluster's pool, if any
+        self.node_type_id = node_type_id            # Defaults to the current cluster's node type when not using a pool
+        self.spark_conf = spark_conf
+
+    def is_single_node(self):
+        return self.num_workers == 0 and self.max_workers is None
+
+    def new_cluster(self, spark_version, instance_pool_id=None, node_type_id=None):
+        """
+        Returns the new_cluster specification of this profile, falling back to the specified pool or node type.
+        """
+        cluster = {
+            "spark_version": spark_version,
+            "runtime_engine": "PHOTON" if self.photon else "STANDARD",
+            "spark_conf": dict(self.spark_conf),
+        }
+        if self.is_single_node():
+            cluster["num_workers"] = 0
+            cluster["spark_conf"].update({"spark.master": "local[*]", "spark.databricks.cluster.profile": "singleNode"})
+            cluster["custom_tags"] = {"ResourceClass": "SingleNode"}
+        elif self.max_workers is not None:
+            cluster["autoscale"] = {"min_workers": self.min_workers or 1, "max_workers": self.max_workers}
+        else:
+            cluster["num_workers"] = self.num_workers
+
+        if self.instance_pool_id or (instance_pool_id and not self.node_type_id):
+            cluster["instance_pool_id"] = self.instance_pool_id or instance_pool_id
+        else:
+            cluster["node_type_id"] = self.node_type_id or node_type_id
+        return cluster
 
 class JobConfig():
-    def __init__(self, job_name, tasks):
+    def __init__(self, job_name, tasks, clusters=None, max_concurrent_runs=1):
         self.job_name = job_name
         self.tasks = tasks
+        self.max_concurrent_runs = max_concurrent_runs
+        # By default every task shares one single-node cluster, see TaskConfig.cluster
+        self.clusters = clusters or [ClusterConfig("shared_cluster")]
 
 # COMMAND ----------
 
@@ -95,66 +137,70 @@ def create_job(self, language):
     Creates the prescribed job.
     """
     import re, json
-    from dbacademy.dbrest import DBAcademyRestClient
-    client = DBAcademyRestClient()
+    client = self.get_rest_client()
 
     config = self.get_job_config(language)
     print(f"Creating the job \"{config.job_name}\"")
 
-    # Delete the existing pipeline if it exists
-    client.jobs().delete_by_name(config.job_name, success_only=False)
-
-    course_name = re.sub("[^a-zA-Z0-9]", "-", DA.course_name)
-    while "--" in course_name: course_name = course_name.replace("--", "-")
-    
-    params = {
-        "name": f"{config.job_name}",
-        "tags": {
-            "dbacademy.course": course_name,
-            "dbacademy.source": course_name
-        },
-        "email_notifications": {},
-        "timeout_seconds": 7200,
-        "max_concurrent_runs": 1,
-        "format": "MULTI_TASK",
-        "tasks": [],
-        "job_clusters": [{
-            "job_cluster_key": "shared_cluster",
-            "new_cluster": {
-                "num_workers": 0,
-                "spark_version": f"{client.clusters().get_current_spark_version()}",
-                "spark_conf": { "spark.master": "local[*]" },
-            },
-        }]
-    }
+    with self.profile("create_job", emit=True):
+        # Delete the existing pipeline if it exists
+        client.jobs().delete_by_name(config.job_name, success_only=False)
+
+        course_name = re.sub("[^a-zA-Z0-9]", "-", DA.course_name)
+        while "--" in course_name: course_name = course_name.replace("--", "-")
     
-    for task in config.tasks:
-        task_def = {
-            "task_key": task.name,
+        params = {
+            "name": f"{config.job_name}",
+            "tags": {
+                "dbacademy.course": course_name,
+                "dbacademy.source": course_name
+            },
+            "email_notifications": {},
+            "timeout_seconds": 7200,
+            "max_concurrent_runs": config.max_concurrent_runs,
+            "format": "MULTI_TASK",
+            "tasks": [],
+            "job_clusters": [],
         }
-        params.get("tasks").append(task_def)
-        if task.cluster is not None: task_def["job_cluster_key"] = task.cluster
+    
+        # Clusters default to the current cluster's spark version and its pool or, if it has none, its node type
+        spark_version = client.clusters().get_current_spark_version()
+        instance_pool_id = client.clusters().get_current_instance_pool_id()
+        node_type_id = None if instance_pool_id else client.clusters().get_current_node_type_id()
+        
+        # Only the clusters used by at least one task are declared
+        cluster_keys = [cluster.key for cluster in config.clusters]
+        used_keys = {task.cluster for task in config.tasks}
+        for cluster in [cluster for cluster in config.clusters if cluster.key in used_keys]:
+            params.get("job_clusters").append({
+                "job_cluster_key": cluster.key,
+                "new_cluster": cluster.new_cluster(spark_version, instance_pool_id, node_type_id),
+            })
+    
+        for task in config.tasks:
+            task_def = {
+                "task_key": task.name,
+            }
+            params.get("tasks").append(task_def)
+            if task.cluster is not None:
+                assert task.cluster in cluster_keys, f"The task {task.name} uses the undefined cluster {task.cluster}, expected one of {cluster_keys}"
+                task_def["job_cluster_key"] = task.cluster
         
-        if task.pipeline_id is not None: task_def["pipeline_task"] = {"pipeline_id": task.pipeline_id}
-        else: task_def["notebook_task"] = {"notebook_path": task.resource}
+            if task.pipeline_id is not None: task_def["pipeline_task"] = {"pipeline_id": task.pipeline_id}
+            else:
+                task_def["notebook_task"] = {"notebook_path": task.resource}
+                if len(task.parameters) > 0: task_def["notebook_task"]["base_parameters"] = task.parameters
             
-        if len(task.depends_on) > 0:
-            task_def["depends_on"] = list()
-            for key in task.depends_on: task_def["depends_on"].append({"task_key":key})
-    
-    instance_pool_id = client.clusters().get_current_instance_pool_id()
-    cluster = params.get("job_clusters")[0].get("new_cluster")
-    if instance_pool_id:
-        cluster["instance_pool_id"] = instance_pool_id
-    else:
-        node_type_id = client.clusters().get_current_node_type_id()
-        cluster["node_type_id"] = node_type_id
-
-    # print(json.dumps(params, indent=4))
+            if len(task.depends_on) > 0:
+                task_def["depends_on"] = list()
+                for key in task.depends_on: task_def["depends_on"].append({"task_key":key})
+    
+
+        # print(json.dumps(params, indent=4))
         
-    json_response = client.jobs().create(params)
-    self.job_id = json_response["job_id"]
-    print(f"Created job {self.job_id}")
+        json_response = client.jobs().create(params)
+        self.job_id = json_response["job_id"]
+        print(f"Created job {self.job_id}")
 
 DBAcademyHelper.monkey_patch(create_job)
 
@@ -163,8 +209,7 @@ DBAcademyHelper.monkey_patch(create_job)
 def start_job(self):
     "Starts the job and then blocks until it is TERMINATED or INTERNAL_ERROR"
 
-    from dbacademy.dbrest import DBAcademyRestClient
-    client = DBAcademyRestClient()
+    client = self.get_rest_client()
 
     run_id = client.jobs().run_now(self.job_id).get("run_id")
     response = client.runs().wait_for(run_id)
@@ -174,3 +219,192 @@ def start_job(self):
 
 DBAcademyHelper.monkey_patch(start_job)
 
+# COMMAND ----------
+
+def _run_job_and_wait(client, job_id, min_interval, max_interval, backoff=1.5):
+    """
+    Returns the run of the job it triggers and waits for, along with the job's and each task's queue and execution seconds.
+    """
+    import time
+    
+    run_id = client.jobs().run_now(job_id).get("run_id")
+    interval = min_interval
+    while True:
+        run = client.runs().get(run_id)
+        if run.get("state").get("life_cycle_state") in ["TERMINATED", "SKIPPED", "INTERNAL_ERROR"]: break
+        time.sleep(interval)
+        interval = min(interval * backoff, max_interval)
+    
+    run_start = run.get("start_time", 0) + run.get("queue_duration", 0)
+    ends = {task.get("task_key"): task.get("end_time", 0) for task in run.get("tasks", [])}
+    tasks = dict()
+    for task in run.get("tasks", []):
+        if not task.get("start_time"): continue # Never started, e.g. the upstream task failed
+        # A task is queued from the moment its dependencies completed until it started executing on its cluster
+        ready = max([ends.get(d.get("task_key"), 0) for d in task.get("depends_on", [])] + [run_start])
+        tasks[task.get("task_key")] = {
+            "state": task.get("state").get("result_state", task.get("state").get("life_cycle_state")),
+            "queue": (task.get("start_time") - ready + task.get("setup_duration", 0)) / 1000,
+            "execution": task.get("execution_duration", 0) / 1000,
+        }
+    
+    return {
+        "run_id": run_id,
+        "state": run.get("state").get("result_state", run.get("state").get("life_cycle_state")),
+        "queue": run.get("queue_duration", 0) / 1000,
+        "duration": max(0, run.get("end_time", 0) - run.get("start_time", 0)) / 1000,
+        "tasks": tasks,
+    }
+
+def start_job_runs(self, runs=4, max_concurrent_runs=None, min_interval=1, max_interval=15):
+    """
+    Triggers the specified number of runs of the job, keeping at most max_concurrent_runs of them in flight such that none is skipped, and blocks until all of them have ended. max_concurrent_runs defaults to, and is capped at, the job's own setting.
+    
+    Prints, and returns, the median and 95th percentile of the job's duration and of each task's queue and execution time, as reported by the Jobs service, along with the outcome of every run.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    client = self.get_rest_client()
+    
+    job = client.execute_get_json(f"{client.endpoint}/api/2.1/jobs/get?job_id={self.job_id}")
+    job_max_concurrent_runs = job.get("settings", {}).get("max_concurrent_runs", 1)
+    if max_concurrent_runs is None:
+        max_concurrent_runs = job_max_concurrent_runs
+    elif max_concurrent_runs > job_max_concurrent_runs:
+        print(f"The job allows at most {job_max_concurrent_runs} concurrent runs, the service would skip any more")
+        max_concurrent_runs = job_max_concurrent_runs
+    
+    print(f"Starting {runs} runs of the job {self.job_id}, {max_concurrent_runs} at a time")
+    with ThreadPoolExecutor(max_workers=max_concurrent_runs) as executor:
+        results = list(executor.map(lambda i: _run_job_and_wait(client, self.job_id, min_interval, max_interval), range(runs)))
+    
+    summary = {"job": {"p50": _percentile([r["duration"] for r in results], 0.50), 
+                       "p95": _percentile([r["duration"] for r in results], 0.95)}}
+    task_keys = list(dict.fromkeys([key for r in results for key in r["tasks"]]))
+    for key in task_keys:
+        queue = [r["tasks"][key]["queue"] for r in results if key in r["tasks"]]
+        execution = [r["tasks"][key]["execution"] for r in results if key in r["tasks"]]
+        summary[key] = {"queue_p50": _percentile(queue, 0.50), "queue_p95": _percentile(queue, 0.95),
+                        "execution_p50": _percentile(execution, 0.50), "execution_p95": _percentile(execution, 0.95)}
+    
+    if len(results) == 0:
+        print("No runs were started")
+        return {"runs": results, "summary": summary}
+    
+    states = [r["state"] for r in results]
+    print(f"Runs: {', '.join([f'{states.count(state)} {state}' for state in dict.fromkeys(states)])}")
+    print(f"Job duration: p50 {summary['job']['p50']:.1f}s, p95 {summary['job']['p95']:.1f}s")
+    if len(task_keys) == 0:
+        print("No task started in any of the runs")
+        return {"runs": results, "summary": summary}
+    
+    print(f"{'Task':<32}{'queue p50':>11}{'queue p95':>11}{'exec p50':>10}{'exec p95':>10}")
+    for key in task_keys:
+        s = summary[key]
+        print(f"{key:<32}{s['queue_p50']:>10.1f}s{s['queue_p95']:>10.1f}s{s['execution_p50']:>9.1f}s{s['execution_p95']:>9.1f}s")
+    
+    return {"runs": results, "summary": summary}
+
+DBAcademyHelper.monkey_patch(start_job_runs)
+
+# COMMAND ----------
+
+def _topological_order(tasks):
+    """
+    Returns the tasks ordered such that every task follows the tasks it depends on, raising a ValueError if a dependency is undefined or circular.
+    """
+    names = [task.name for task in tasks]
+    for task in tasks:
+        for name in task.depends_on:
+            if name not in names: raise ValueError(f"The task {task.name} depends on the undefined task {name}")
+    
+    ordered, done = list(), set()
+    while len(ordered) < len(tasks):
+        ready = [task for task in tasks if task.name not in done and all(name in done for name in task.depends_on)]
+        if len(ready) == 0: raise ValueError(f"The tasks {[name for name in names if name not in done]} have circular dependencies")
+        ordered.extend(ready)
+        done.update([task.name for task in ready])
+    return ordered
+
+def _critical_path(tasks, durations):
+    """
+    Returns the chain of dependent tasks with the longest total duration, and that duration.
+    """
+    finish, previous = dict(), dict()
+    for task in _topological_order(tasks):
+        upstream = max(task.depends_on, key=lambda name: finish[name], default=None)
+        previous[task.name] = upstream
+        finish[task.name] = (0 if upstream is None else finish[upstream]) + durations.get(task.name, 0)
+    
+    path, name = list(), max(finish, key=finish.get, default=None)
+    while name is not None:
+        path.insert(0, name)
+        name = previous[name]
+    return path, max(finish.values(), default=0)
+
+# COMMAND ----------
+
+def run_job_locally(self, language, run_task=None, max_workers=4, timeout_seconds=3600):
+    """
+    Runs the tasks of the prescribed job from this notebook instead of submitting the job to the Jobs service. Each task is started on a pool of max_workers threads as soon as the tasks it depends on have succeeded, such that independent branches run concurrently, while the tasks downstream of a failed task are skipped.
+    
+    By default notebook tasks are run with dbutils.notebook.run() and pipeline tasks with start_pipelines(); specify run_task(task) to run them otherwise, e.g. against a local Spark session. Returns, and prints, the outcome of each task along with the wall-clock time, the total task time and the critical path.
+    """
+    import time
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+    
+    config = self.get_job_config(language)
+    tasks = _topological_order(config.tasks)
+    
+    if run_task is None:
+        def run_task(task):
+            if task.pipeline_id is None:
+                dbutils.notebook.run(task.resource, timeout_seconds, task.parameters)
+            else:
+                state = self.start_pipelines([task.pipeline_id])[0].get("state")
+                assert state == "COMPLETED", f"Expected the pipeline's state to be COMPLETED, found {state}"
+    
+    start = time.time()
+    results = dict() # Task name -> state, seconds from the start of the job to the start of the task, duration & error
+    
+    def execute(task):
+        task_start = time.time()
+        try:
+            run_task(task)
+            return {"state": "SUCCESS", "start": task_start - start, "duration": time.time() - task_start, "error": None}
+        except Exception as e:
+            return {"state": "FAILED", "start": task_start - start, "duration": time.time() - task_start, "error": str(e)}
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        waiting, running = list(tasks), dict()
+        while len(waiting) > 0 or len(running) > 0:
+            # Tasks are visited in topological order, so upstream failures propagate in a single pass
+            for task in list(waiting):
+                states = [results.get(name, {}).get("state") for name in task.depends_on]
+                if any(state in ["FAILED", "UPSTREAM_FAILED"] for state in states):
+                    results[task.name] = {"state": "UPSTREAM_FAILED", "start": None, "duration": 0, "error": None}
+                    waiting.remove(task)
+                elif all(state == "SUCCESS" for state in states):
+                    running[executor.submit(execute, task)] = task
+                    waiting.remove(task)
+            
+            if len(running) > 0:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done: results[running.pop(future).name] = future.result()
+    
+    wall = time.time() - start
+    durations = {name: result["duration"] for name, result in results.items()}
+    total = sum(durations.values())
+    path, path_seconds = _critical_path(tasks, durations)
+    
+    for task in tasks:
+        result = results[task.name]
+        started = "-" if result["start"] is None else f"{result['start']:.1f}s"
+        print(f"{task.name:<32} {result['state']:<16} started at {started:>7}, ran for {result['duration']:.1f}s")
+        if result["error"]: print(f"{'':<32} {result['error']}")
+    print(f"Wall-clock time: {wall:.1f}s, total task time: {total:.1f}s ({total / max(wall, 0.001):.1f}x parallelism)")
+    print(f"Critical path: {' > '.join(path)} ({path_seconds:.1f}s, {wall - path_seconds:.1f}s spent waiting for a worker or scheduling)")
+    
+    return {"wall": wall, "total": total, "critical_path": path, "critical_path_seconds": path_seconds, "tasks": results}
+
+DBAcademyHelper.monkey_patch(run_job_locally)
+
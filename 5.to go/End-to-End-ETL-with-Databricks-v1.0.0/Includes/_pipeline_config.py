@@ -75,60 +75,168 @@ DBAcademyHelper.monkey_patch(print_pipeline_config)
 
 # COMMAND ----------
 
+def _normalize_configuration(configuration):
+    """
+    Returns the configuration with every value rendered as the string returned by the REST API.
+    """
+    return {key: str(value).lower() if isinstance(value, bool) else str(value) for key, value in (configuration or {}).items()}
+
+def _diff_pipeline_settings(spec, storage, target, notebooks, configuration):
+    """
+    Compares the spec of an existing pipeline to the prescribed settings, returning the names of the settings that differ. Configuration keys that are not prescribed are ignored.
+    """
+    configuration = _normalize_configuration(configuration)
+    current_configuration = _normalize_configuration(spec.get("configuration"))
+    
+    current = {
+        "storage": spec.get("storage"),
+        "target": spec.get("target"),
+        "notebooks": [library.get("notebook", {}).get("path") for library in spec.get("libraries", [])],
+        "configuration": {key: current_configuration.get(key) for key in configuration},
+    }
+    prescribed = {
+        "storage": storage,
+        "target": target,
+        "notebooks": notebooks,
+        "configuration": configuration,
+    }
+    return [key for key in prescribed if current[key] != prescribed[key]]
+
+# COMMAND ----------
+
 def create_pipeline(self, language, from_job=False):
     """
-    Creates the prescribed pipline.
+    Creates the prescribed pipline or, if it already exists, reuses it - editing its settings in place when they differ from the prescribed ones.
     """
     
-    from dbacademy.dbrest import DBAcademyRestClient
-    client = DBAcademyRestClient()
+    client = self.get_rest_client()
 
     config = self.get_pipeline_config(language, from_job)
-    print(f"Creating the pipeline \"{config.pipeline_name}\"")
-
-    # Delete the existing pipeline if it exists
-    client.pipelines().delete_by_name(config.pipeline_name)
-
-    # Create the new pipeline
-    pipeline = client.pipelines().create(
-        name = config.pipeline_name, 
-        development=True,
-        storage = self.paths.storage_location, 
-        target = self.db_name, 
-        notebooks = config.notebooks,
+    print(f"Creating or updating the pipeline \"{config.pipeline_name}\"")
+
+    with self.profile("create_pipeline", emit=True):
         configuration = {
             "source": config.source,
             "pipelines.applyChangesPreviewEnabled": True
-        })
+        }
+        
+        # Reuse the existing pipeline, and with it its state and checkpoints, editing it only if its settings differ
+        existing = client.pipelines().get_by_name(config.pipeline_name)
+        if existing is not None:
+            pipeline_id = existing.get("pipeline_id")
+            spec = client.pipelines().get_by_id(pipeline_id).get("spec")
+            changes = _diff_pipeline_settings(spec, self.paths.storage_location, self.db_name, config.notebooks, configuration)
+            
+            if len(changes) == 0:
+                print(f"Reusing the unchanged pipeline {pipeline_id}")
+                self.pipeline_id = pipeline_id
+                return
+            
+            elif "storage" not in changes: # The storage location cannot be edited
+                print(f"Updating the {', '.join(changes)} of the pipeline {pipeline_id}")
+                spec["storage"] = self.paths.storage_location
+                spec["target"] = self.db_name
+                spec["libraries"] = [{"notebook": {"path": path}} for path in config.notebooks]
+                spec["configuration"] = {**spec.get("configuration", {}), **_normalize_configuration(configuration)}
+                client.execute_put_json(f"{client.endpoint}/api/2.0/pipelines/{pipeline_id}", spec)
+                self.pipeline_id = pipeline_id
+                return
+            
+            # Delete the existing pipeline as it cannot be updated in place
+            client.pipelines().delete_by_name(config.pipeline_name)
+
+        # Create the new pipeline
+        pipeline = client.pipelines().create(
+            name = config.pipeline_name, 
+            development=True,
+            storage = self.paths.storage_location, 
+            target = self.db_name, 
+            notebooks = config.notebooks,
+            configuration = configuration)
     
-    self.pipeline_id = pipeline.get("pipeline_id")
-       
+        self.pipeline_id = pipeline.get("pipeline_id")
+
 DBAcademyHelper.monkey_patch(create_pipeline)
 
 # COMMAND ----------
 
-def start_pipeline(self):
-    "Starts the pipline and then blocks until it has completed, failed or was canceled"
+def _run_async(coroutine):
+    """
+    Returns the result of the coroutine, run in a separate thread if this thread already runs an event loop (e.g. under IPython).
+    """
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    
+    try: asyncio.get_running_loop()
+    except RuntimeError: return asyncio.run(coroutine)
+    
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
 
-    import time
-    from dbacademy.dbrest import DBAcademyRestClient
-    client = DBAcademyRestClient()
+async def _run_pipeline_update(client, pipeline_id, min_interval, max_interval, backoff=1.5):
+    """
+    Starts an update of the specified pipeline and polls it until it has completed, failed or was canceled. The polling interval starts at min_interval seconds and grows by the backoff factor up to max_interval seconds. Returns the final state, the wall-clock duration and the time at which each state was first observed.
+    """
+    import asyncio, time
+    
+    loop = asyncio.get_running_loop()
+    start = time.time()
+    
+    response = await loop.run_in_executor(None, client.pipelines().start_by_id, pipeline_id)
+    update_id = response.get("update_id")
+    
+    transitions = list() # (state, seconds since start)
+    interval = min_interval
+    
+    while True:
+        update = await loop.run_in_executor(None, client.pipelines().get_update_by_id, pipeline_id, update_id)
+        state = update.get("update").get("state")
+        if len(transitions) == 0 or transitions[-1][0] != state:
+            transitions.append((state, round(time.time() - start, 1)))
+            print(f"Pipeline {pipeline_id}: {state} after {transitions[-1][1]} seconds")
+        
+        if state in ["COMPLETED", "FAILED", "CANCELED"]: break
+        
+        await asyncio.sleep(interval)
+        interval = min(interval * backoff, max_interval)
+    
+    return {
+        "pipeline_id": pipeline_id,
+        "update_id": update_id,
+        "state": state,
+        "duration": round(time.time() - start, 1),
+        "transitions": transitions,
+    }
 
-    # Start the pipeline
-    start = client.pipelines().start_by_id(self.pipeline_id)
-    update_id = start.get("update_id")
+# COMMAND ----------
 
-    # Get the status and block until it is done
-    update = client.pipelines().get_update_by_id(self.pipeline_id, update_id)
-    state = update.get("update").get("state")
+def start_pipelines(self, pipeline_ids, min_interval=1, max_interval=15):
+    """
+    Concurrently starts one update of each of the specified pipelines and then blocks until all of them have completed, failed or were canceled, returning the per-update results of _run_pipeline_update().
+    """
+    import asyncio
+    client = self.get_rest_client()
+    
+    async def run_all():
+        return await asyncio.gather(*[_run_pipeline_update(client, pipeline_id, min_interval, max_interval) for pipeline_id in pipeline_ids])
+    
+    results = _run_async(run_all())
+    
+    for result in results:
+        transitions = ", ".join([f"{state} @ {seconds}s" for state, seconds in result["transitions"]])
+        print(f"Pipeline {result['pipeline_id']}: {result['state']} in {result['duration']} seconds ({transitions})")
+    
+    return results
 
-    done = ["COMPLETED", "FAILED", "CANCELED"]
-    while state not in done:
-        duration = 15
-        time.sleep(duration)
-        print(f"Current state is {state}, sleeping {duration} seconds.")    
-        update = client.pipelines().get_update_by_id(self.pipeline_id, update_id)
-        state = update.get("update").get("state")
+DBAcademyHelper.monkey_patch(start_pipelines)
+
+# COMMAND ----------
+
+def start_pipeline(self):
+    "Starts the pipline and then blocks until it has completed, failed or was canceled"
+
+    result = self.start_pipelines([self.pipeline_id])[0]
+    state = result.get("state")
     
     print(f"The final state is {state}.")    
     assert state == "COMPLETED", f"Expected the state to be COMPLETED, found {state}"
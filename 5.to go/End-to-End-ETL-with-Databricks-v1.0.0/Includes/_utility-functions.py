@@ -22,6 +22,10 @@ _max_time = "10 min"  # The maximum amount of time to install the datasets (e.g.
 # in turn creates a checkpoints path for all checkpoint files.
 _enable_streaming_support = False 
 
+# Set to true to record the SHA-256 of every dataset file in the manifest at install 
+# time and to verify it upon validation - trustworthy but requires reading every file.
+_checksum_datasets = False
+
 # COMMAND ----------
 
 # Defines the files "expected" to exist in DBFS - required for execution in Financial and Government workspaces
@@ -69,11 +73,21 @@ class Paths():
 
 # COMMAND ----------
 
+def _stable_hash(value, modulo=10000):
+    """
+    Returns a hash of the specified string that, unlike Python's salted hash(), is the same in every process: the first 8 bytes of its SHA-256 modulo the specified value.
+    """
+    import hashlib
+    return int(hashlib.sha256(value.encode("utf-8")).hexdigest()[:16], 16) % modulo
+
 class DBAcademyHelper():
     def __init__(self, lesson=None, asynchronous=True):
         import re, time
 
         self.start = int(time.time())
+        init_start = time.time()
+        self.profile_records = list() # See profile() and save_profile()
+        self.profile_saved = 0        # The number of profile_records already emitted by save_profile()
         
         # Intialize from our global variables defined at the top of the notebook
         global _course_code, _course_name, _data_source_name, _data_source_version, _naming_params, _remote_files
@@ -93,7 +107,7 @@ class DBAcademyHelper():
         if lesson is None and asynchronous and is_smoke_test:
             # The developer did not define a lesson, we can run asynchronous, and this 
             # is a smoke test so we can define a lesson here for the sake of testing
-            lesson = str(abs(hash(dbgems.get_notebook_path())) % 10000)
+            lesson = str(_stable_hash(dbgems.get_notebook_path()))
             
         self.lesson = None if lesson is None else lesson.lower()
 
@@ -135,16 +149,21 @@ class DBAcademyHelper():
 
         # This is where the datasets will be downloaded to and should be treated as read-only for all pratical purposes
         self.hidden.datasets = f"dbfs:/mnt/dbacademy-datasets/{self.data_source_name}/{self.data_source_version}"
+
+        # The manifest of the installed datasets is cached next to, not in, the datasets directory
+        self.hidden.manifest = f"{self.hidden.datasets}.manifest.json"
         
         # This is the location in our Azure data repository of the datasets for this lesson
         self.data_source_uri = f"wasbs://courseware@dbacademy.blob.core.windows.net/{self.data_source_name}/{self.data_source_version}"
+
+        self.record_profile("init", init_start, time.time())
     
     def get_username_hash(self):
         """
         Utility method to split the user's email address, dropping the domain, and then creating a hash based on the full email address and course_code. The primary usage of this function is in creating the user's database, but is also used in creating SQL Endpoints, DLT Piplines, etc - any place we need a short, student-specific name.
         """
         da_name = self.username.split("@")[0]                                   # Split the username, dropping the domain
-        da_hash = abs(hash(f"{self.username}-{self.course_code}")) % 10000      # Create a has from the full username and course code
+        da_hash = _stable_hash(f"{self.username}-{self.course_code}")           # Create a stable hash from the full username and course code
         return da_name, da_hash
 
     @staticmethod
@@ -162,6 +181,81 @@ class DBAcademyHelper():
 
 # COMMAND ----------
 
+from contextlib import contextmanager
+
+# The columns of the records of profile(), see save_profile()
+_profile_schema = [("course_code", "STRING"), ("data_source_version", "STRING"), ("lesson", "STRING"), ("workspace", "STRING"),
+                   ("phase", "STRING"), ("start", "STRING"), ("duration_seconds", "DOUBLE")]
+
+def record_profile(self, phase, start, end):
+    """
+    Records the duration of one setup phase, see profile().
+    """
+    import datetime
+    
+    self.profile_records.append({
+        "course_code": self.course_code,
+        "data_source_version": self.data_source_version,
+        "lesson": self.lesson,
+        "workspace": spark.conf.get("spark.databricks.workspaceUrl", None),
+        "phase": phase,
+        "start": datetime.datetime.fromtimestamp(start, datetime.timezone.utc).isoformat(),
+        "duration_seconds": round(end - start, 3),
+    })
+
+@contextmanager
+def profile(self, phase, emit=False):
+    """
+    Context manager used to time a setup phase (e.g. with DA.profile("install"): ...), the structured record of which is appended to self.profile_records even if the phase fails.
+    
+    When emit is True, the record is also emitted right away as configured, see emit_profile(), which is what phases run by the lessons after conclude_setup() require.
+    """
+    import time
+    
+    start = time.time()
+    try: yield
+    finally:
+        self.record_profile(phase, start, time.time())
+        if emit: self.emit_profile()
+
+def save_profile(self, table=None, path=None):
+    """
+    Emits the records collected by profile() since the last call by appending them to the specified Delta table and/or by writing them as a JSON-lines file to the specified directory.
+    """
+    import json, time, uuid
+    
+    records = self.profile_records[self.profile_saved:]
+    if len(records) == 0: return
+    
+    if table is not None:
+        # Explicit, as the type of lesson and workspace cannot be inferred when they are None
+        columns = [name for name, data_type in _profile_schema]
+        rows = [tuple([record[name] for name in columns]) for record in records]
+        schema = ", ".join([f"{name} {data_type}" for name, data_type in _profile_schema])
+        spark.createDataFrame(rows, schema).write.mode("append").option("mergeSchema", "true").saveAsTable(table)
+        
+    if path is not None:
+        lines = "\n".join([json.dumps(record) for record in records])
+        dbutils.fs.put(f"{path}/{self.course_code}-{int(time.time())}-{uuid.uuid4().hex[:8]}.json", lines, True)
+    
+    self.profile_saved += len(records)
+
+def emit_profile(self):
+    """
+    Saves the records not yet emitted to the table and/or directory specified by the Spark confs dbacademy.profile-table and dbacademy.profile-path, if either is set.
+    """
+    profile_table = spark.conf.get("dbacademy.profile-table", None)
+    profile_path = spark.conf.get("dbacademy.profile-path", None)
+    if profile_table or profile_path: 
+        self.save_profile(table=profile_table, path=profile_path)
+
+DBAcademyHelper.monkey_patch(record_profile)
+DBAcademyHelper.monkey_patch(profile)
+DBAcademyHelper.monkey_patch(save_profile)
+DBAcademyHelper.monkey_patch(emit_profile)
+
+# COMMAND ----------
+
 def init(self, create_db=True):
     """
     This function aims to setup the invironment enabling the constructor to provide initialization of attributes only and thus not modifying the environment upon initialization.
@@ -171,9 +265,10 @@ def init(self, create_db=True):
     self.create_db = create_db # Flag to indicate if we are creating the database or not
 
     if create_db:
-        print(f"\nCreating the database \"{self.db_name}\"")
-        spark.sql(f"CREATE DATABASE IF NOT EXISTS {self.db_name} LOCATION '{self.paths.user_db}'")
-        spark.sql(f"USE {self.db_name}")
+        with self.profile("create_database"):
+            print(f"\nCreating the database \"{self.db_name}\"")
+            spark.sql(f"CREATE DATABASE IF NOT EXISTS {self.db_name} LOCATION '{self.paths.user_db}'")
+            spark.sql(f"USE {self.db_name}")
 
 DBAcademyHelper.monkey_patch(init)
 
@@ -182,22 +277,63 @@ DBAcademyHelper.monkey_patch(init)
 def cleanup(self, validate=True):
     """
     Cleans up the user environment by stopping any active streams, dropping the database created by the call to init() and removing the user's lesson-specific working directory and any assets created in that directory.
+    
+    Streams are stopped concurrently after which the database is dropped while the rest of the working directory is removed, printing the time spent on each step. The database's own directory, in the working directory, is left to the drop and only removed after it.
     """
-
-    for stream in spark.streams.active:
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    
+    timings = dict()
+    
+    def timed(label, function):
+        start = time.time()
+        function()
+        timings[label] = time.time() - start
+    
+    def stop_stream(stream):
         print(f"Stopping the stream \"{stream.name}\"")
         stream.stop()
         try: stream.awaitTermination()
         except: pass # Bury any exceptions
 
-    if spark.sql(f"SHOW DATABASES").filter(f"databaseName == '{self.db_name}'").count() == 1:
-        print(f"Dropping the database \"{self.db_name}\"")
-        spark.sql(f"DROP DATABASE {self.db_name} CASCADE")
+    def stop_streams():
+        streams = spark.streams.active
+        if len(streams) == 0: return
+        with ThreadPoolExecutor(max_workers=len(streams)) as executor:
+            list(executor.map(stop_stream, streams))
+    
+    def drop_database():
+        if spark.sql(f"SHOW DATABASES LIKE '{self.db_name}'").count() == 1:
+            print(f"Dropping the database \"{self.db_name}\"")
+            spark.sql(f"DROP DATABASE IF EXISTS {self.db_name} CASCADE")
+
+    def remove_working_dir():
+        if self.paths.exists(self.paths.working_dir):
+            print(f"Removing the working directory \"{self.paths.working_dir}\"")
+            db_dir_name = self.paths.user_db.rstrip("/").split("/")[-1]
+            for f in dbutils.fs.ls(self.paths.working_dir):
+                if f.name.rstrip("/") != db_dir_name: dbutils.fs.rm(f.path, True)
+
+    def remove_database_dir():
+        # Whatever the drop left of the database's directory, along with the working directory itself
+        if self.paths.exists(self.paths.working_dir):
+            dbutils.fs.rm(self.paths.working_dir, True)
+
+    start = time.time()
+    
+    # Streams must be stopped first lest they write to the database or working directory
+    timed("streams", stop_streams)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(timed, "database", drop_database),
+                   executor.submit(timed, "working directory", remove_working_dir)]
+        for future in futures: future.result()
 
-    if self.paths.exists(self.paths.working_dir):
-        print(f"Removing the working directory \"{self.paths.working_dir}\"")
-        dbutils.fs.rm(self.paths.working_dir, True)
+    timed("database directory", remove_database_dir)
 
+    breakdown = ", ".join([f"{label}: {duration:.1f}" for label, duration in timings.items()])
+    print(f"Cleanup completed in {time.time()-start:.1f} seconds ({breakdown})")
+    
     if validate:
         print()
         self.validate_datasets(fail_fast=False)
@@ -209,36 +345,59 @@ DBAcademyHelper.monkey_patch(cleanup)
 def conclude_setup(self):
     """
     Concludes the setup of DBAcademyHelper by advertising to the student the new state of the environment such as predefined path variables, databases and tables created on behalf of the student and the total setup time. Additionally, all path attributes are pushed to the Spark context for reference in SQL statements.
+    
+    The time spent in each profiled phase is printed as well and, if the Spark conf "dbacademy.profile-table" or "dbacademy.profile-path" is set, the profile is saved there.
     """
 
     import time
 
-    # Inject the user's database name
-    # Add custom attributes to the SQL context here.
-    spark.conf.set("da.db_name", self.db_name)
-    spark.conf.set("DA.db_name", self.db_name)
-    
-    # Automatically add all path attributes to the SQL context as well.
-    for key in self.paths.__dict__:
-        spark.conf.set(f"da.paths.{key.lower()}", self.paths.__dict__[key])
-        spark.conf.set(f"DA.paths.{key.lower()}", self.paths.__dict__[key])
+    with self.profile("inject_conf"):
+        # Inject the user's database name
+        # Add custom attributes to the SQL context here.
+        spark.conf.set("da.db_name", self.db_name)
+        spark.conf.set("DA.db_name", self.db_name)
+        
+        # Automatically add all path attributes to the SQL context as well.
+        for key in self.paths.__dict__:
+            spark.conf.set(f"da.paths.{key.lower()}", self.paths.__dict__[key])
+            spark.conf.set(f"DA.paths.{key.lower()}", self.paths.__dict__[key])
 
     print("\nPredefined Paths:")
     self.paths.print()
 
     if self.create_db:
         print(f"\nPredefined tables in {self.db_name}:")
-        tables = spark.sql(f"SHOW TABLES IN {self.db_name}").filter("isTemporary == false").select("tableName").collect()
+        with self.profile("list_tables"):
+            tables = spark.sql(f"SHOW TABLES IN {self.db_name}").filter("isTemporary == false").select("tableName").collect()
         if len(tables) == 0: print("  -none-")
         for row in tables: print(f"  {row[0]}")
 
     print(f"\nSetup completed in {int(time.time())-self.start} seconds")
+    for record in self.profile_records:
+        print(f"  {record['phase']}: {record['duration_seconds']:.1f} seconds")
+
+    self.emit_profile()
 
 DBAcademyHelper.monkey_patch(conclude_setup)
 
 # COMMAND ----------
 
-def block_until_stream_is_ready(self, query, min_batches=2):
+def _create_progress_listener(on_progress, on_terminated):
+    """
+    Returns a StreamingQueryListener forwarding every progress and termination event to the specified callbacks, or None when the Python listener API is not available in this runtime.
+    """
+    try: from pyspark.sql.streaming import StreamingQueryListener
+    except ImportError: return None
+    
+    class ProgressListener(StreamingQueryListener):
+        def onQueryStarted(self, event): pass
+        def onQueryIdle(self, event): pass
+        def onQueryProgress(self, event): on_progress(str(event.progress.id), event.progress.batchId, event.progress.numInputRows)
+        def onQueryTerminated(self, event): on_terminated()
+            
+    return ProgressListener()
+
+def block_until_stream_is_ready(self, query, min_batches=2, min_rows=None, timeout=None, poll_seconds=1):
     """
     A utility method used in streaming notebooks to block until the stream has processed n batches. This method serves one main purpose in two different usescase
     
@@ -247,14 +406,56 @@ def block_until_stream_is_ready(self, query, min_batches=2):
     The first use case is in jobs where where the stream is started in one cell but execution of subsequent cells start prematurely.
     
     The second use case is to slow down students who likewise attempt to execute subsequent cells before the stream is in a valid state either by invoking subsequent cells directly or by execute the Run-All Command
+    
+    The query may also be a list of queries, in which case every query must have processed min_batches batches and, if specified, min_rows input rows. Progress is delivered by a StreamingQueryListener where supported, falling back to polling every poll_seconds. A TimeoutError is raised if the streams are not ready within timeout seconds and an exception is raised if any stream terminates first.
         
     Note: it is best to show the students this code the first time so that they understand what it is doing and why, but from that point forward, just call it via the DA object.
     """
-    import time
-    while len(query.recentProgress) < min_batches:
-        time.sleep(5) # Give it a couple of seconds
+    import time, threading
+    
+    queries = query if isinstance(query, list) else [query]
+    batches = {str(q.id): dict() for q in queries} # batchId -> numInputRows, per query
+    condition = threading.Condition()
+    
+    def on_progress(query_id, batch_id, num_rows):
+        with condition:
+            if query_id in batches: batches[query_id][batch_id] = num_rows
+            condition.notify_all()
+            
+    def on_terminated():
+        with condition: condition.notify_all()
+            
+    def is_ready(q):
+        progress = batches[str(q.id)]
+        return len(progress) >= min_batches and (min_rows is None or sum(progress.values()) >= min_rows)
 
-    print(f"The stream has processed {len(query.recentProgress)} batchs")
+    listener = _create_progress_listener(on_progress, on_terminated)
+    try: spark.streams.addListener(listener)
+    except Exception: listener = None # Not supported in this runtime, we will poll instead
+    
+    try:
+        deadline = None if timeout is None else time.time() + timeout
+        with condition:
+            while True:
+                # Covers batches completed before the listener was registered
+                for q in queries:
+                    for progress in q.recentProgress: on_progress(str(q.id), progress["batchId"], progress["numInputRows"])
+                
+                if all(is_ready(q) for q in queries): break
+                
+                for q in queries:
+                    if not q.isActive: raise Exception(f"The stream \"{q.name}\" terminated before it was ready: {q.exception()}")
+
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"The streams were not ready after {timeout} seconds")
+                
+                condition.wait(poll_seconds if remaining is None else min(poll_seconds, remaining))
+    finally:
+        if listener is not None: spark.streams.removeListener(listener)
+
+    for q in queries:
+        print(f"The stream \"{q.name}\" has processed {len(batches[str(q.id)])} batchs")
     
 DBAcademyHelper.monkey_patch(block_until_stream_is_ready)
 
@@ -299,12 +500,22 @@ def install_datasets(self, reinstall=False, repairing=False):
     print(f"\nInstalling {len(files)} {what}: ")
     
     install_start = int(time.time())
-    for f in files:
-        start = int(time.time())
-        print(f"Copying /{f.name[:-1]}", end="...")
-
-        dbutils.fs.cp(f"{self.data_source_uri}/{f.name}", f"{self.hidden.datasets}/{f.name}", True)
-        print(f"({int(time.time())-start} seconds)")
+    with self.profile("install"):
+        for f in files:
+            start = int(time.time())
+            print(f"Copying /{f.name[:-1]}", end="...")
+
+            dbutils.fs.cp(f"{self.data_source_uri}/{f.name}", f"{self.hidden.datasets}/{f.name}", True)
+            print(f"({int(time.time())-start} seconds)")
+
+    global _checksum_datasets
+    manifest = self.build_manifest(self.data_source_uri)
+    if _checksum_datasets:
+        # Checksums can only be computed against the local copy, merge them into the remote manifest
+        local_manifest = self.build_manifest(self.hidden.datasets, checksum=True)
+        for path, entry in manifest.items():
+            if path in local_manifest: entry["checksum"] = local_manifest[path]["checksum"]
+    self.cache_manifest(manifest)
 
     print()
     self.validate_datasets(fail_fast=True)
@@ -314,20 +525,37 @@ DBAcademyHelper.monkey_patch(install_datasets)
 
 # COMMAND ----------
 
-def list_r(self, path, prefix=None, results=None):
+def iter_r(self, path, max_workers=8):
+    """
+    Utility method used by list_r(), this method performs a breadth-first, recursive list of the specified path and yields each FileInfo as soon as its parent directory has been listed. Sub-directories are listed concurrently and as such, no ordering is guaranteed.
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {executor.submit(dbutils.fs.ls, path)}
+        while len(pending) > 0:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for file in future.result():
+                    if file.isDir(): 
+                        pending.add(executor.submit(dbutils.fs.ls, file.path))
+                    yield file
+
+DBAcademyHelper.monkey_patch(iter_r)
+
+def list_r(self, path, prefix=None, results=None, stream=False, max_workers=8):
     """
     Utility method used by the dataset validation, this method performs a recursive list of the specified path and returns the sorted list of paths.
+    
+    Directories are listed concurrently (see iter_r()) and the results are sorted only once, at the end. When stream=True, an unsorted generator of paths is returned instead.
     """
     if prefix is None: prefix = path
-    if results is None: results = list()
     
-    files = dbutils.fs.ls(path)
-    for file in files:
-        data = file.path[len(prefix):]
-        results.append(data)
-        if file.isDir(): 
-            self.list_r(file.path, prefix, results)
-        
+    files = (file.path[len(prefix):] for file in self.iter_r(path, max_workers))
+    if stream: return files
+
+    if results is None: results = list()
+    results.extend(files)
     results.sort()
     return results
 
@@ -365,42 +593,136 @@ DBAcademyHelper.monkey_patch(enumerate_local_datasets)
 
 # COMMAND ----------
 
-def do_validate(self):
+def _fuse_path(path):
+    """
+    Returns the /dbfs/ FUSE equivalent of the specified dbfs:/ path.
     """
-    Utility method to compare local datasets to the registered list of remote files.
+    return path.replace("dbfs:/", "/dbfs/", 1)
+
+def _checksum(path):
     """
+    Returns the SHA-256 of the specified file, read in 1 MB chunks through the /dbfs/ FUSE mount.
+    """
+    import hashlib
     
-    local_files = self.list_r(self.hidden.datasets)
+    digest = hashlib.sha256()
+    with open(_fuse_path(path), "rb") as f:
+        for chunk in iter(lambda: f.read(1024*1024), b""): 
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _diff_manifests(expected, actual):
+    """
+    Compares two manifests with a single hash-set diff returning the sorted lists of missing, extra and changed paths. Sizes and checksums are only compared when recorded in both manifests.
+    """
+    missing = sorted(expected.keys() - actual.keys())
+    extra = sorted(actual.keys() - expected.keys())
+    changed = list()
     
-    for file in local_files:
-        if file not in self.remote_files:
-            print(f"\n  - Found extra file: {file}")
-            print(f"  - This problem can be fixed by reinstalling the datasets")
-            return False
+    for path in sorted(expected.keys() & actual.keys()):
+        for key in ["size", "checksum"]:
+            expected_value, actual_value = expected[path].get(key), actual[path].get(key)
+            if expected_value is not None and actual_value is not None and expected_value != actual_value:
+                changed.append(path)
+                break
+            
+    return missing, extra, changed
 
-    for file in self.remote_files:
-        if file not in local_files:
-            print(f"\n  - Missing file: {file}")
-            print(f"  - This problem can be fixed by reinstalling the datasets")
-            return False
-        
-    return True
+# COMMAND ----------
+
+def build_manifest(self, path, checksum=False):
+    """
+    Builds the manifest of the specified path, a dictionary keyed by the relative path of each file and directory recording its size and, when checksum is True, the SHA-256 of its content. Checksums require the path to be on DBFS.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    files = list(self.iter_r(path))
+    manifest = dict()
+    for file in files:
+        manifest[file.path[len(path):]] = {"size": None if file.isDir() else file.size, "checksum": None}
+
+    if checksum:
+        data_files = [f for f in files if not f.isDir()]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for file, digest in zip(data_files, executor.map(lambda f: _checksum(f.path), data_files)):
+                manifest[file.path[len(path):]]["checksum"] = digest
+            
+    return manifest
+
+def cache_manifest(self, manifest):
+    """
+    Writes the specified manifest as JSON next to the installed datasets.
+    """
+    import json
+    dbutils.fs.put(self.hidden.manifest, json.dumps(manifest, indent=0, sort_keys=True), True)
+
+def load_manifest(self):
+    """
+    Returns the cached manifest of the installed datasets or, when none was cached, a manifest derived from the registered list of remote files which records paths only.
+    
+    Datasets installed before manifests were cached, by a course that registers no remote files, are instead compared to the manifest of the remote data repository, which is then cached for subsequent validations.
+    """
+    import json
+    if self.paths.exists(self.hidden.manifest):
+        return json.loads(dbutils.fs.head(self.hidden.manifest, 1024*1024*1024))
+    
+    if len(self.remote_files) > 0:
+        return {path: {"size": None, "checksum": None} for path in self.remote_files}
+    
+    manifest = self.build_manifest(self.data_source_uri)
+    if len(manifest) > 0: self.cache_manifest(manifest)
+    return manifest
+
+DBAcademyHelper.monkey_patch(build_manifest)
+DBAcademyHelper.monkey_patch(cache_manifest)
+DBAcademyHelper.monkey_patch(load_manifest)
+
+# COMMAND ----------
+
+def do_validate(self):
+    """
+    Utility method to compare local datasets to the manifest of remote files, reporting every missing, extra or changed file in one pass. The differences are retained as self.validation_diff and the two manifests compared as self.validation_manifests.
+    """
+    global _checksum_datasets
+    
+    expected = self.load_manifest()
+    actual = self.build_manifest(self.hidden.datasets, checksum=_checksum_datasets)
+    missing, extra, changed = _diff_manifests(expected, actual)
+    self.validation_diff = (missing, extra, changed)
+    self.validation_manifests = (expected, actual)
+
+    for file in extra: print(f"\n  - Found extra file: {file}", end="")
+    for file in missing: print(f"\n  - Missing file: {file}", end="")
+    for file in changed: print(f"\n  - Changed file: {file}", end="")
+    
+    if len(extra) + len(missing) + len(changed) == 0:
+        return True
+    
+    print(f"\n  - This problem can be fixed by reinstalling the datasets")
+    return False
     
 
 def validate_datasets(self, fail_fast:bool):
     """
-    Validates the "install" of the datasets by recursively listing all files in the remote data repository as well as the local data repository, validating that each file exists but DOES NOT validate file size or checksum.
+    Validates the "install" of the datasets by recursively listing all files in the local data repository and comparing them to the cached manifest of the remote data repository, validating that each file exists with the expected size and, if _checksum_datasets is True, the expected checksum.
     """
     import time
     start = int(time.time())
     print(f"Validating the local copy of the datsets", end="...")
     
-    if not self.do_validate():
+    with self.profile("validate"):
+        valid = self.do_validate()
+    
+    if not valid:
         if fail_fast:
             raise Exception("Validation failed - see previous messages for more information.")
         else:
             print("\nAttempting to repair local dataset...\n")
-            self.install_datasets(reinstall=True, repairing=True)
+            with self.profile("repair"):
+                repaired = self.repair_datasets()
+            if not repaired:
+                print("\nThe incremental repair failed, reinstalling the datasets...\n")
+                self.install_datasets(reinstall=True, repairing=True)
     
     print(f"({int(time.time())-start} seconds)")
 
@@ -409,6 +731,154 @@ DBAcademyHelper.monkey_patch(validate_datasets)
 
 # COMMAND ----------
 
+def repair_datasets(self, max_workers=8):
+    """
+    Incrementally repairs the local datasets using the differences identified by the last call to do_validate(): missing and changed files are copied from the remote data repository and extra files are deleted, leaving every other file untouched. Returns the result of re-validating the datasets.
+    
+    Files are only deleted against a non-empty manifest cached by install_datasets() and, when the extra files make up most of the datasets, nothing is repaired. In either case, as well as when the repair leaves the dataset directory empty, False is returned for the datasets to be reinstalled instead.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    missing, extra, changed = self.validation_diff
+    expected, actual = self.validation_manifests
+
+    if len(extra) > 0 and (len(expected) == 0 or not self.paths.exists(self.hidden.manifest)):
+        print(f"  - Not deleting {len(extra)} extra files without a cached manifest of the datasets")
+        return False
+    
+    if len(extra) * 2 > len(actual):
+        print(f"  - Not deleting {len(extra)} extra files out of {len(actual)}")
+        return False
+
+    # Directories are (re)created implicitly by copying their files and extra
+    # directories are removed recursively, so their children can be skipped.
+    to_copy = [f for f in missing + changed if not f.endswith("/")]
+    extra_dirs = [f for f in extra if f.endswith("/")]
+    to_delete = [f for f in extra if not any(f != d and f.startswith(d) for d in extra_dirs)]
+
+    def copy_file(file):
+        dbutils.fs.cp(f"{self.data_source_uri}{file}", f"{self.hidden.datasets}{file}")
+        return f"Copied {file}"
+
+    def delete_file(file):
+        dbutils.fs.rm(f"{self.hidden.datasets}{file}", True)
+        return f"Deleted {file}"
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(copy_file, f) for f in to_copy]
+        futures += [executor.submit(delete_file, f) for f in to_delete]
+        for future in futures: 
+            print(f"  - {future.result()}")
+
+    print(f"Repaired {len(to_copy)+len(to_delete)} files, re-validating", end="...")
+    if not self.do_validate():
+        return False
+    
+    if not self.paths.exists(self.hidden.datasets) or len(dbutils.fs.ls(self.hidden.datasets)) == 0:
+        print(f"\n  - The repair left no datasets in {self.hidden.datasets}")
+        return False
+    
+    return True
+
+DBAcademyHelper.monkey_patch(repair_datasets)
+
+# COMMAND ----------
+
+_rest_client = None                 # The process-wide client returned by get_rest_client()
+_rest_latencies = dict()            # Seconds per call, keyed by endpoint (e.g. "pipelines.get_update_by_id")
+_rest_client_factories = ["pipelines", "jobs", "runs", "clusters"]
+
+def _record_rest_latency(endpoint, seconds):
+    """
+    Records the latency of one REST call, see print_rest_latencies().
+    """
+    _rest_latencies.setdefault(endpoint, list()).append(seconds)
+
+def _percentile(values, percentile):
+    """
+    Returns the nearest-rank percentile, between 0 and 1, of the values or None if there are none.
+    """
+    import math
+    values = sorted(values)
+    return values[max(0, math.ceil(percentile * len(values)) - 1)] if len(values) > 0 else None
+
+class _TimedRestClient():
+    """
+    Wraps a DBAcademyRestClient (or one of its sub-clients) recording the latency of every call by endpoint.
+    """
+    def __init__(self, target, prefix=""):
+        self._target = target
+        self._prefix = prefix
+        
+    def __getattr__(self, name):
+        import time
+        
+        attribute = getattr(self._target, name)
+        if not callable(attribute): return attribute
+        
+        if name in _rest_client_factories:
+            # Sub-clients, e.g. client.pipelines(), are wrapped in turn
+            return lambda *args, **kwargs: _TimedRestClient(attribute(*args, **kwargs), f"{name}.")
+        
+        def timed(*args, **kwargs):
+            start = time.time()
+            try: return attribute(*args, **kwargs)
+            finally: _record_rest_latency(f"{self._prefix}{name}", time.time() - start)
+            
+        return timed
+
+def _mount_pooled_adapter(session, pool_size=32, retries=5):
+    """
+    Mounts an HTTPAdapter on the specified requests session that keeps up to pool_size connections alive and retries throttled (429) and unavailable (5xx) idempotent requests with jittered exponential backoff.
+    """
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    
+    retry_args = {"total": retries, "backoff_factor": 0.5, "status_forcelist": [429, 500, 502, 503, 504]}
+    try: retry = Retry(backoff_jitter=0.5, **retry_args)  # urllib3 >= 2.0
+    except TypeError: retry = Retry(**retry_args)          # jitter is not supported by older versions
+        
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+def get_rest_client(self):
+    """
+    Returns the process-wide REST client used by the pipeline and job helpers, creating it upon first use. Reusing one client avoids a new TLS handshake per call: when the client exposes its requests session, a pooled keep-alive adapter with retries is mounted on it. The latency of every call is recorded, see print_rest_latencies().
+    """
+    global _rest_client
+    
+    if _rest_client is None:
+        from dbacademy.dbrest import DBAcademyRestClient
+        client = DBAcademyRestClient()
+        
+        session = getattr(client, "session", None)
+        if session is not None: _mount_pooled_adapter(session)
+            
+        _rest_client = _TimedRestClient(client)
+        
+    return _rest_client
+
+def print_rest_latencies(self):
+    """
+    Prints, for every REST endpoint called through get_rest_client(), the number of calls, the median, 95th percentile and maximum latency and a histogram of latencies.
+    """
+    buckets = [0.1, 0.25, 0.5, 1, 2.5, 5]
+    labels = [f"<{b}s" for b in buckets] + [f">={buckets[-1]}s"]
+    
+    print(f"{'Endpoint':<40}{'Calls':>6}{'p50':>8}{'p95':>8}{'Max':>8}  " + " ".join([label.rjust(7) for label in labels]))
+    for endpoint, latencies in sorted(_rest_latencies.items()):
+        p50, p95 = _percentile(latencies, 0.50), _percentile(latencies, 0.95)
+        counts = [0] * len(labels)
+        for latency in latencies:
+            counts[next((i for i, b in enumerate(buckets) if latency < b), len(buckets))] += 1
+        print(f"{endpoint:<40}{len(latencies):>6}{p50:>8.3f}{p95:>8.3f}{max(latencies):>8.3f}  " + " ".join([str(c).rjust(7) for c in counts]))
+
+DBAcademyHelper.monkey_patch(get_rest_client)
+DBAcademyHelper.monkey_patch(print_rest_latencies)
+
+# COMMAND ----------
+
 # MAGIC %run ./_pipeline_config
 
 # COMMAND ----------
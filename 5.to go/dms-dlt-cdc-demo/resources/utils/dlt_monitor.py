@@ -0,0 +1,122 @@
+import time
+import asyncio
+import argparse
+from dlt_runner import create_api_client, get_update_state, print_latencies
+
+TERMINAL_STATES = ['COMPLETED', 'FAILED', 'CANCELED']
+INITIALIZING_STATES = ['INITIALIZING', 'RESETTING', 'SETTING_UP_TABLES']
+
+
+def start_update(api_client, pipeline_id, full_refresh=False, refresh_selection=None):
+    data = {'full_refresh': full_refresh}
+    if refresh_selection:
+        data['refresh_selection'] = refresh_selection
+
+    update_id = api_client.perform_query('POST', f'/pipelines/{pipeline_id}/updates', data=data).get('update_id', '')
+    if update_id == '':
+        raise Exception(f"Updating pipeline {pipeline_id} failed")
+    return update_id
+
+
+def phase_timings(transitions, end):
+    """Splits the observed (state, seconds) transitions into queued, initializing and running seconds."""
+    first_seen = {}
+    for state, seconds in transitions:
+        first_seen.setdefault(state, seconds)
+
+    def first_of(states, default):
+        seen = [first_seen[state] for state in states if state in first_seen]
+        return min(seen) if seen else default
+
+    terminal = first_of(TERMINAL_STATES, end)
+    running = first_of(['RUNNING'], terminal)
+    initializing = first_of(INITIALIZING_STATES, running)
+    return {
+        'queued': initializing,
+        'initializing': running - initializing,
+        'running': terminal - running,
+        'total': end,
+    }
+
+
+async def update_and_monitor(api_client, pipeline_id, full_refresh=False, refresh_selection=None,
+                             min_interval=2, max_interval=30, backoff=1.5):
+    loop = asyncio.get_running_loop()
+    start = time.time()
+
+    update_id = await loop.run_in_executor(None, start_update, api_client, pipeline_id, full_refresh, refresh_selection)
+    print(f"{pipeline_id}: started update {update_id}")
+
+    transitions = []
+    interval = min_interval
+    while True:
+        state = await loop.run_in_executor(None, get_update_state, api_client, pipeline_id, update_id)
+        if not transitions or transitions[-1][0] != state:
+            transitions.append((state, time.time() - start))
+            print(f"{pipeline_id}: {state} after {transitions[-1][1]:.0f} seconds")
+
+        if state in TERMINAL_STATES:
+            break
+
+        await asyncio.sleep(interval)
+        interval = min(interval * backoff, max_interval)
+
+    return {
+        'pipeline_id': pipeline_id,
+        'update_id': update_id,
+        'state': state,
+        'timings': phase_timings(transitions, time.time() - start),
+    }
+
+
+async def monitor_all(api_client, pipelines, min_interval, max_interval):
+    """Updates and monitors every pipeline, a pipeline that cannot be started or polled is reported in state ERROR."""
+    results = await asyncio.gather(*[
+        update_and_monitor(api_client, pipeline_id, min_interval=min_interval, max_interval=max_interval, **options)
+        for pipeline_id, options in pipelines.items()], return_exceptions=True)
+
+    for i, (pipeline_id, result) in enumerate(zip(pipelines, results)):
+        if isinstance(result, BaseException):
+            print(f"{pipeline_id}: {type(result).__name__}: {result}")
+            results[i] = {'pipeline_id': pipeline_id, 'update_id': None, 'state': 'ERROR', 'error': str(result), 'timings': None}
+    return results
+
+
+def print_timings(results):
+    print()
+    print(f"{'pipeline':<38}{'state':<11}{'queued':>8}{'init':>8}{'running':>9}{'total':>8}")
+    print('-' * 82)
+    for result in results:
+        timings = result['timings']
+        if timings is None:
+            print(f"{result['pipeline_id']:<38}{result['state']:<11}  {result['error']}")
+            continue
+        print(f"{result['pipeline_id']:<38}{result['state']:<11}{timings['queued']:>8.0f}{timings['initializing']:>8.0f}"
+              f"{timings['running']:>9.0f}{timings['total']:>8.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Update several DLT pipelines concurrently and report their timings')
+    parser.add_argument('--pipeline-id', type=str, action='append', required=True,
+                        help='pipeline to update, may be repeated')
+    parser.add_argument('--full-refresh', type=str, action='append', default=[],
+                        help='pipeline id to fully refresh, may be repeated, "all" for every pipeline')
+    parser.add_argument('--refresh-selection', type=str, action='append', default=[],
+                        help='PIPELINE_ID=table1,table2 to only refresh the listed tables, may be repeated')
+    parser.add_argument('--min-interval', type=float, default=2)
+    parser.add_argument('--max-interval', type=float, default=30)
+    parser.add_argument('--profile', type=str, default='')
+    args = parser.parse_args()
+
+    pipelines = {pipeline_id: {'full_refresh': pipeline_id in args.full_refresh or 'all' in args.full_refresh}
+                 for pipeline_id in args.pipeline_id}
+    for selection in args.refresh_selection:
+        pipeline_id, tables = selection.split('=', 1)
+        if pipeline_id not in pipelines:
+            parser.error(f"--refresh-selection refers to {pipeline_id} which is not a --pipeline-id")
+        pipelines[pipeline_id]['refresh_selection'] = tables.split(',')
+
+    api_client = create_api_client(args.profile)
+    results = asyncio.run(monitor_all(api_client, pipelines, args.min_interval, args.max_interval))
+    print_timings(results)
+    print_latencies()
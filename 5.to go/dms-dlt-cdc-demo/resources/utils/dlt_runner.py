@@ -1,12 +1,55 @@
 from email.policy import default
+import re
+import math
 import time
 import argparse
+import threading
+from collections import defaultdict
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from databricks_cli.configure.config import _get_api_client
 from databricks_cli.configure.provider import EnvironmentVariableConfigProvider, \
     ProfileConfigProvider
 from databricks_cli.sdk import DeltaPipelinesService
 
+_api_clients = {}
+_latencies = defaultdict(list)
+_latencies_lock = threading.Lock()
+
+
+def _mount_pooled_adapter(session, pool_size=32, retries=5):
+    # Keeps connections alive across polls and retries throttled (429) and unavailable (5xx) calls with jittered backoff
+    retry_args = {'total': retries, 'backoff_factor': 0.5, 'status_forcelist': [429, 500, 502, 503, 504]}
+    try:
+        retry = Retry(backoff_jitter=0.5, **retry_args)
+    except TypeError:  # urllib3 < 2.0 does not support jitter
+        retry = Retry(**retry_args)
+
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+
+def _record_latencies(api_client):
+    perform_query = api_client.perform_query
+
+    def timed_perform_query(method, path, *args, **kwargs):
+        endpoint = f"{method} {re.sub(r'/[0-9a-fA-F-]{8,}', '/{id}', path)}"
+        start = time.time()
+        try:
+            return perform_query(method, path, *args, **kwargs)
+        finally:
+            with _latencies_lock:
+                _latencies[endpoint].append(time.time() - start)
+
+    api_client.perform_query = timed_perform_query
+
+
 def create_api_client(profile=''):
+    # One client per profile so that every caller shares its connection pool
+    if profile in _api_clients:
+        return _api_clients[profile]
+
     try:
         if profile == '':
             config = EnvironmentVariableConfigProvider().get_config()
@@ -22,9 +65,41 @@ def create_api_client(profile=''):
         print("Please create DATABRICKS_HOST and DATABRICKS_TOKEN env variables")
         print("Or pass Databrick profile as such --profile")
 
+    if getattr(api_client, 'session', None) is not None:
+        _mount_pooled_adapter(api_client.session)
+    _record_latencies(api_client)
+
+    _api_clients[profile] = api_client
     return api_client
 
 
+def nearest_rank(values, fraction):
+    """Returns the nearest-rank percentile of the sorted values, the fraction being between 0 and 1."""
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def print_latencies():
+    buckets = [0.1, 0.25, 0.5, 1, 2.5, 5]
+    labels = [f'<{b}s' for b in buckets] + [f'>={buckets[-1]}s']
+
+    print()
+    print(f"{'endpoint':<48}{'calls':>6}{'p50':>8}{'p95':>8}{'max':>8}  " + ' '.join(label.rjust(7) for label in labels))
+    with _latencies_lock:
+        latencies_by_endpoint = {endpoint: sorted(latencies) for endpoint, latencies in _latencies.items()}
+    for endpoint, latencies in sorted(latencies_by_endpoint.items()):
+        p50, p95 = nearest_rank(latencies, 0.50), nearest_rank(latencies, 0.95)
+        counts = [0] * len(labels)
+        for latency in latencies:
+            counts[next((i for i, b in enumerate(buckets) if latency < b), len(buckets))] += 1
+        print(f"{endpoint:<48}{len(latencies):>6}{p50:>8.3f}{p95:>8.3f}{latencies[-1]:>8.3f}  "
+              + ' '.join(str(count).rjust(7) for count in counts))
+
+
+def get_update_state(api_client, pipeline_id, update_id):
+    # Only fetches the one update rather than the whole pipeline with its latest updates
+    return api_client.perform_query('GET', f'/pipelines/{pipeline_id}/updates/{update_id}')['update']['state']
+
+
 def update_and_monitor(api_client, pipeline_id, full_refresh=False):
     pipeline_service = DeltaPipelinesService(api_client)
 
@@ -39,11 +114,7 @@ def update_and_monitor(api_client, pipeline_id, full_refresh=False):
     print("Started Pipeline Update.")
     while True:
         print("Pipeline still updating...")
-        pipeline_info = pipeline_service.get(pipeline_id=pipeline_id)
-        pipeline_updates = pipeline_info['latest_updates']
-        
-        pipeline_update_state = list(filter(lambda updates: updates['update_id'] ==\
-            pipeline_update_id, pipeline_updates))[0]['state']
+        pipeline_update_state = get_update_state(api_client, pipeline_id, pipeline_update_id)
 
         if pipeline_update_state in ['FAILED','CANCELED']:
             print(f'Pipeline Update Ended with the {pipeline_update_state}')
@@ -63,4 +134,5 @@ if __name__ == "__main__":
     args = parser.parse_args()
 
     api_client = create_api_client(args.profile)
-    update_and_monitor(api_client, args.pipeline_id, full_refresh=args.full_refresh)
\ No newline at end of file
+    update_and_monitor(api_client, args.pipeline_id, full_refresh=args.full_refresh)
+    print_latencies()